@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Archive member listing for the dumpers
+Lists the files inside zip and tar archives without extracting anything, so
+they can be indexed as virtual entries like "backup.zip!/docs/resume.pdf".
+Zip archives are listed from their central directory at the end of the file;
+uncompressed tars by seeking from header to header. Compressed tars have to be
+decompressed to reach their headers, so they are only listed up to a size cap.
+"""
+
+import tarfile
+import time
+import zipfile
+
+# Separates the archive path from the member path in virtual entries
+ARCHIVE_SEPARATOR = "!/"
+
+ZIP_EXTENSIONS = (".zip", ".jar")
+TAR_EXTENSIONS = (".tar",)
+COMPRESSED_TAR_EXTENSIONS = (".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Members listed per archive; the rest are ignored
+MAX_MEMBERS = 5000
+# Compressed tars larger than this are indexed as a single file only
+MAX_COMPRESSED_TAR_BYTES = 64 * 1024 * 1024
+
+
+def is_archive(name):
+    """Whether name has an extension whose members we can list"""
+    lower = name.lower()
+    return lower.endswith(ZIP_EXTENSIONS + TAR_EXTENSIONS + COMPRESSED_TAR_EXTENSIONS)
+
+
+def _clean(member_name):
+    """Member path relative to the archive root, as shown in virtual entries"""
+    name = member_name.replace("\\", "/")
+    while name.startswith(("./", "/")):
+        name = name[2:] if name.startswith("./") else name[1:]
+    return name
+
+
+def _zip_members(archive_path, limit):
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            # Zip stores local wall-clock time without a timezone
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            yield _clean(info.filename), info.file_size, mtime
+            limit -= 1
+            if limit <= 0:
+                return
+
+
+def _tar_members(archive_path, limit, compressed):
+    # Stream mode never seeks backwards, so a compressed tar is decompressed once
+    with tarfile.open(archive_path, "r|*" if compressed else "r:") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            yield _clean(member.name), member.size, float(member.mtime)
+            limit -= 1
+            if limit <= 0:
+                return
+
+
+def list_members(archive_path, archive_size, limit=MAX_MEMBERS):
+    """[(member_path, size, mtime), ...] for the regular files in an archive
+
+    Returns an empty list for archives that are unreadable, corrupt or over the
+    compressed-tar size cap; the archive itself is still indexed by the caller.
+    """
+    lower = archive_path.lower()
+    try:
+        if lower.endswith(ZIP_EXTENSIONS):
+            return [m for m in _zip_members(archive_path, limit) if m[0]]
+        if lower.endswith(COMPRESSED_TAR_EXTENSIONS):
+            if archive_size > MAX_COMPRESSED_TAR_BYTES:
+                return []
+            return [m for m in _tar_members(archive_path, limit, True) if m[0]]
+        if lower.endswith(TAR_EXTENSIONS):
+            return [m for m in _tar_members(archive_path, limit, False) if m[0]]
+    except (OSError, EOFError, ValueError, OverflowError, zipfile.BadZipFile, tarfile.TarError):
+        pass
+    return []
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Exact NumPy backend vs LEANN HNSW benchmark
+Builds both indexes from the same synthetic normalized embeddings at several
+corpus sizes and reports build time, single and batched query latency, and
+HNSW recall@k against the exact results. Each size also runs the int8 and PQ
+exact variants, with and without reranking, and two-stage variants (PCA first
+pass at several candidate counts), reporting the bytes scanned per query and
+their recall@k. Outputs JSON metrics.
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from leann import LeannBuilder, LeannSearcher
+
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from exact_index import ExactSearcher, build_exact_index, normalize_rows
+
+CORPUS_SIZES = [1000, 10000, 50000, 100000]
+DIMENSIONS = 768  # facebook/contriever, LEANN's default model
+QUERY_COUNT = 100
+# (quantization, keep full vectors for reranking)
+QUANTIZED_VARIANTS = [("int8", False), ("int8", True), ("pq", False), ("pq", True)]
+COARSE_DIMS = [64, 128]
+COARSE_CANDIDATES = [64, 256, 1024]
+TOP_K = 10
+SEED = 7
+
+
+def synthetic_corpus(rng, n, dims):
+    """Clustered vectors, closer to real embeddings than uniform noise"""
+    centers = rng.standard_normal((max(n // 200, 8), dims)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), n)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((n, dims)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def latency_stats(seconds):
+    ms = np.array(seconds) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)),
+            'mean_ms': float(ms.mean())}
+
+
+def benchmark_size(n, rng, workdir):
+    vectors = synthetic_corpus(rng, n, DIMENSIONS)
+    queries = synthetic_corpus(rng, QUERY_COUNT, DIMENSIONS)
+    ids = [str(i) for i in range(n)]
+    chunks = [{"text": f"file {i}", "metadata": {}} for i in range(n)]
+    result = {'corpus_size': n}
+
+    exact_path = str(workdir / f"exact_{n}.leann")
+    start = time.time()
+    build_exact_index(exact_path, ids, vectors, chunks, "facebook/contriever", "sentence-transformers")
+    result['exact_build_seconds'] = time.time() - start
+
+    builder = LeannBuilder(backend_name="hnsw", is_recompute=False)
+    for chunk in chunks:
+        builder.add_text(chunk["text"], metadata=chunk["metadata"])
+    hnsw_path = str(workdir / f"hnsw_{n}.leann")
+    start = time.time()
+    builder.build_index_from_arrays(hnsw_path, ids, vectors)
+    result['hnsw_build_seconds'] = time.time() - start
+
+    start = time.time()
+    exact = ExactSearcher(exact_path)
+    result['exact_load_seconds'] = time.time() - start
+    start = time.time()
+    hnsw = LeannSearcher(hnsw_path)
+    result['hnsw_load_seconds'] = time.time() - start
+
+    exact_times, hnsw_times, recalls = [], [], []
+    for query in queries:
+        q = query[None, :]
+        start = time.perf_counter()
+        exact_labels = exact.backend_impl.search(q, TOP_K)['labels'][0]
+        exact_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hnsw_labels = hnsw.backend_impl.search(q, TOP_K, complexity=64, recompute_embeddings=False)['labels'][0]
+        hnsw_times.append(time.perf_counter() - start)
+        recalls.append(len(set(exact_labels) & set(map(str, hnsw_labels))) / TOP_K)
+
+    start = time.perf_counter()
+    exact.search_batch(queries, TOP_K)
+    batch_time = time.perf_counter() - start
+
+    result['exact_query'] = latency_stats(exact_times)
+    result['hnsw_query'] = latency_stats(hnsw_times)
+    result['exact_batched_ms_per_query'] = batch_time / QUERY_COUNT * 1000
+    result[f'hnsw_recall@{TOP_K}'] = float(np.mean(recalls))
+
+    exact_results = exact.search_batch(queries, TOP_K)['labels']
+    result['exact_scan_bytes'] = int(exact.vectors.nbytes)
+    result['quantized'] = [benchmark_quantized(quantization, keep_full, workdir, n, ids, vectors, chunks,
+                                               queries, exact_results)
+                           for quantization, keep_full in QUANTIZED_VARIANTS]
+    result['two_stage'] = [variant for dims in COARSE_DIMS
+                           for variant in benchmark_two_stage(dims, workdir, n, ids, vectors, chunks,
+                                                              queries, exact_results)]
+
+    exact.cleanup()
+    hnsw.cleanup()
+    return result
+
+
+def benchmark_quantized(quantization, keep_full, workdir, n, ids, vectors, chunks, queries, exact_results):
+    path = str(workdir / f"{quantization}_{keep_full}_{n}.leann")
+    start = time.time()
+    build_exact_index(path, ids, vectors, chunks, "facebook/contriever", "sentence-transformers",
+                      quantization=quantization, keep_full=keep_full)
+    build_time = time.time() - start
+
+    searcher = ExactSearcher(path)
+    start = time.perf_counter()
+    labels = searcher.search_batch(queries, TOP_K)['labels']
+    batch_time = time.perf_counter() - start
+    recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(exact_results, labels)])
+    searcher.cleanup()
+    return {'quantization': quantization, 'rerank': keep_full, 'build_seconds': build_time,
+            'scan_bytes': int(searcher.vectors.nbytes),
+            'batched_ms_per_query': batch_time / QUERY_COUNT * 1000,
+            f'recall@{TOP_K}': float(recall)}
+
+
+def benchmark_two_stage(dims, workdir, n, ids, vectors, chunks, queries, exact_results):
+    path = str(workdir / f"coarse{dims}_{n}.leann")
+    start = time.time()
+    build_exact_index(path, ids, vectors, chunks, "facebook/contriever", "sentence-transformers",
+                      coarse_dims=dims)
+    build_time = time.time() - start
+
+    searcher = ExactSearcher(path)
+    variants = []
+    for candidates in COARSE_CANDIDATES:
+        single = []
+        for query in queries:
+            start = time.perf_counter()
+            searcher.search_batch(query[None, :], TOP_K, candidates=candidates)
+            single.append(time.perf_counter() - start)
+        labels = searcher.search_batch(queries, TOP_K, candidates=candidates)['labels']
+        recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(exact_results, labels)])
+        variants.append({'coarse_dims': dims, 'candidates': candidates, 'build_seconds': build_time,
+                         'scan_bytes': int(searcher.coarse_vectors.nbytes), 'query': latency_stats(single),
+                         f'recall@{TOP_K}': float(recall)})
+    searcher.cleanup()
+    return variants
+
+
+def run_benchmark():
+    rng = np.random.default_rng(SEED)
+    workdir = Path(tempfile.mkdtemp(prefix="exact_bench_"))
+    results = {'timestamp': datetime.now().isoformat(), 'dimensions': DIMENSIONS,
+               'top_k': TOP_K, 'sizes': []}
+    try:
+        for n in CORPUS_SIZES:
+            print(f"Benchmarking {n} vectors...")
+            results['sizes'].append(benchmark_size(n, rng, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
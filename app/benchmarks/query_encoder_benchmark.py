@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Query encoder benchmark
+LEANN's default query encoding against the CPU-optimized encoders in
+query_encoder.py: load time, single-query latency at several thread counts,
+and embedding drift (cosine similarity to the default encoder's embeddings,
+plus top-k agreement when searching a set of document embeddings).
+Outputs JSON metrics.
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from leann.api import compute_embeddings
+
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from query_encoder import ONNX_FILE, QUANTIZED_ONNX_FILE, QueryEncoder
+
+MODEL = "facebook/contriever"  # LEANN's default model
+THREAD_COUNTS = [1, 2, 4]
+RUNS_PER_QUERY = 5
+TOP_K = 10
+
+TEST_QUERIES = [
+    "python files from last week",
+    "photos of my dog",
+    "budget spreadsheet 2024",
+    "meeting notes about the product launch",
+    "screenshots",
+    "tax documents pdf",
+    "music by the beatles",
+    "presentation slides for the conference",
+    "invoices from amazon",
+    "resume cover letter",
+]
+# Stand-in documents in the index's text format, for top-k agreement
+DOCUMENTS = [
+    f"{name} located at /home/user/{folder}/{name} and size {size} bytes with content type {mime} and kind {kind}"
+    for folder, names, mime, kind in [
+        ("Documents", ["report_q3.pdf", "taxes_2023.pdf", "invoice_1042.pdf", "resume.docx", "cover_letter.docx"],
+         "application/pdf", "document"),
+        ("Pictures", ["dog_park.jpg", "beach.png", "screenshot_2024.png", "family.heic", "cat.jpg"],
+         "image/jpeg", "image"),
+        ("Music", ["hey_jude.mp3", "let_it_be.flac", "podcast_ep12.mp3"], "audio/mpeg", "audio"),
+        ("code", ["parse_logs.py", "server.py", "budget.xlsx", "notes.md", "launch_plan.key"],
+         "text/x-python", "code"),
+    ]
+    for size, name in enumerate(names, start=1024)
+]
+
+
+def reference_encode(texts):
+    return np.asarray(compute_embeddings(texts, MODEL, "sentence-transformers", use_server=False),
+                      dtype=np.float32)
+
+
+def normalize(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def latency(encode):
+    times = []
+    for query in TEST_QUERIES:
+        for _ in range(RUNS_PER_QUERY):
+            start = time.perf_counter()
+            encode([query])
+            times.append(time.perf_counter() - start)
+    ms = np.array(times) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)),
+            'mean_ms': float(ms.mean())}
+
+
+def drift(embeddings, reference, documents):
+    cosine = (normalize(embeddings) * normalize(reference)).sum(axis=1)
+    ours = np.argsort(-(embeddings @ documents.T), axis=1)[:, :TOP_K]
+    theirs = np.argsort(-(reference @ documents.T), axis=1)[:, :TOP_K]
+    agreement = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(ours, theirs)])
+    return {'min_cosine': float(cosine.min()), 'mean_cosine': float(cosine.mean()),
+            f'top{TOP_K}_agreement': float(agreement)}
+
+
+def run_benchmark(model_path):
+    results = {'timestamp': datetime.now().isoformat(), 'model': MODEL, 'model_path': model_path,
+               'encoders': []}
+
+    start = time.time()
+    reference_encode(TEST_QUERIES[:1])
+    results['default_load_seconds'] = time.time() - start
+    results['default_latency'] = latency(reference_encode)
+    reference = reference_encode(TEST_QUERIES)
+    documents = reference_encode(DOCUMENTS)
+
+    variants = [("torch-int8", ONNX_FILE), ("onnx", ONNX_FILE), ("onnx", QUANTIZED_ONNX_FILE)]
+    for kind, onnx_file in variants:
+        for threads in THREAD_COUNTS:
+            print(f"Benchmarking {kind} ({onnx_file if kind == 'onnx' else 'dynamic int8'}, {threads} threads)...")
+            try:
+                encoder = QueryEncoder(kind, model_path, threads=threads, onnx_file=onnx_file)
+            except Exception as e:
+                results['encoders'].append({'encoder': kind, 'onnx_file': onnx_file, 'threads': threads,
+                                            'error': f"{e.__class__.__name__}: {e}"})
+                continue
+            results['encoders'].append({
+                'encoder': encoder.kind,
+                'threads': threads,
+                'load_seconds': encoder.load_seconds,
+                'latency': latency(encoder.encode),
+                **drift(encoder.encode(TEST_QUERIES), reference, documents),
+            })
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python query_encoder_benchmark.py <local model dir from query_encoder.py export>")
+        sys.exit(1)
+    run_benchmark(sys.argv[1])
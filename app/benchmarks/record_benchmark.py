@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Dump record construction benchmark
+Times building metadata records for already-stat'ed files with the per-file
+mimetypes/datetime calls the dumpers used to make versus the cached fast path,
+plus a __slots__ record for comparison. Syscalls are done up front and are not
+part of the timings. Outputs JSON metrics.
+"""
+
+import json
+import mimetypes
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawler import walk_files
+from file_records import file_type, iso_timestamp
+
+MAX_FILES = 200000
+ROUNDS = 3
+
+
+def baseline_record(file_path, stat):
+    """Record exactly as get_metadata built it before the fast path"""
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if mime_type is None:
+        mime_type = "unknown"
+    return {
+        "Path": file_path,
+        "Name": os.path.basename(file_path),
+        "Size": stat.st_size,
+        "ContentType": mime_type,
+        "Kind": mime_type.split("/")[-1] if "/" in mime_type else mime_type,
+        "CreationDate": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "ContentChangeDate": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+    }
+
+
+def fast_record(file_path, stat):
+    """Record as get_metadata builds it now (without the identity fields)"""
+    name = file_path.rpartition("/")[2]
+    _, mime_type, kind = file_type(name)
+    return {
+        "Path": file_path,
+        "Name": name,
+        "Size": stat.st_size,
+        "ContentType": mime_type,
+        "Kind": kind,
+        "CreationDate": iso_timestamp(stat.st_ctime),
+        "ContentChangeDate": iso_timestamp(stat.st_mtime),
+    }
+
+
+class SlotsRecord:
+    """Compact record alternative; still needs converting to a dict for the JSON dump"""
+    __slots__ = ("path", "name", "size", "content_type", "kind", "created", "modified")
+
+    def __init__(self, path, name, size, content_type, kind, created, modified):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.content_type = content_type
+        self.kind = kind
+        self.created = created
+        self.modified = modified
+
+
+def slots_record(file_path, stat):
+    name = file_path.rpartition("/")[2]
+    _, mime_type, kind = file_type(name)
+    return SlotsRecord(file_path, name, stat.st_size, mime_type, kind,
+                       iso_timestamp(stat.st_ctime), iso_timestamp(stat.st_mtime))
+
+
+def collect_files(root, limit):
+    """(path, stat) pairs for up to limit files under root"""
+    files = []
+    for file_path in walk_files([root]):
+        try:
+            files.append((file_path, os.stat(file_path)))
+        except OSError:
+            continue
+        if len(files) >= limit:
+            break
+    return files
+
+
+def time_builder(build, files):
+    """Best-of-ROUNDS wall time for building all records"""
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for file_path, stat in files:
+            build(file_path, stat)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(root):
+    print(f"Collecting up to {MAX_FILES} files under {root}...")
+    files = collect_files(root, MAX_FILES)
+    if not files:
+        print("No files found")
+        return None
+    print(f"Timing record construction for {len(files)} files ({ROUNDS} rounds, best kept)...")
+
+    mismatches = sum(baseline_record(p, s) != fast_record(p, s) for p, s in files)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'root': root,
+        'files': len(files),
+        'distinct_extensions': len({file_type(p.rpartition("/")[2])[0] for p, _ in files}),
+        'fast_path_mismatches': mismatches,
+        'builders': {},
+    }
+    baseline_time = None
+    for label, build in (('baseline_dict', baseline_record),
+                         ('fast_dict', fast_record),
+                         ('fast_slots', slots_record)):
+        elapsed = time_builder(build, files)
+        baseline_time = baseline_time or elapsed
+        results['builders'][label] = {
+            'seconds': elapsed,
+            'us_per_record': elapsed / len(files) * 1e6,
+            'records_per_second': len(files) / elapsed if elapsed > 0 else 0,
+            'speedup_vs_baseline': baseline_time / elapsed if elapsed > 0 else 0,
+        }
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    root_arg = sys.argv[1] if len(sys.argv) > 1 else os.path.expanduser("~")
+    run_benchmark(root_arg)
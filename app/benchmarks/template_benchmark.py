@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Embedding template benchmark
+For every registered embedding template: tokens per item, embedding throughput
+and known-item retrieval quality on a sample of a metadata dump. Queries are
+built from file names ("quarterly_report_2023.pdf" -> "quarterly report 2023"),
+the target is the file itself; recall@k and MRR come from exact cosine search
+over the sample. Outputs JSON metrics.
+"""
+
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from leann import LeannBuilder
+from leann.api import compute_embeddings
+
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from embedding_templates import TEMPLATES, count_tokens, set_token_counter
+
+SAMPLE_SIZE = 5000
+QUERY_COUNT = 300
+RECALL_AT = (1, 5, 10)
+SEED = 42
+
+
+def use_model_tokenizer(model_name):
+    """Count tokens with the embedding model's own tokenizer when transformers has it"""
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        print(f"Using approximate token counts ({e.__class__.__name__} loading tokenizer)")
+        return False
+    set_token_counter(lambda text: len(tokenizer.encode(text, add_special_tokens=False)))
+    return True
+
+
+def name_query(item):
+    """Known-item query a user might type for this file: its name without extension/separators"""
+    stem = str(item.get('Name', '')).rsplit('.', 1)[0]
+    words = re.sub(r"[_\-.]+|(?<=[a-z])(?=[A-Z])", " ", stem).split()
+    return " ".join(words).lower()
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def evaluate_template(template, items, query_rows, query_vectors, model, mode):
+    texts = [template.render(item) for item in items]
+    tokens = [count_tokens(text) for text in texts]
+
+    start = time.time()
+    doc_vectors = normalize(compute_embeddings(texts, model, mode, use_server=False))
+    embed_time = time.time() - start
+
+    scores = query_vectors @ doc_vectors.T
+    ranks = []
+    for qi, row in enumerate(query_rows):
+        # 1-based rank of the target among all sampled items
+        ranks.append(int((scores[qi] > scores[qi, row]).sum()) + 1)
+    ranks = np.array(ranks)
+
+    return {
+        'template': template.key,
+        'example': texts[0],
+        'tokens_per_item': float(np.mean(tokens)),
+        'tokens_p95': float(np.percentile(tokens, 95)),
+        'chars_per_item': float(np.mean([len(t) for t in texts])),
+        'embed_seconds': embed_time,
+        'items_per_second': len(texts) / embed_time if embed_time > 0 else 0,
+        **{f'recall@{k}': float((ranks <= k).mean()) for k in RECALL_AT},
+        'mrr': float((1.0 / ranks).mean()),
+    }
+
+
+def run_benchmark(dump_file):
+    with open(dump_file, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    rng = random.Random(SEED)
+    if len(items) > SAMPLE_SIZE:
+        items = rng.sample(items, SAMPLE_SIZE)
+
+    candidates = [i for i, item in enumerate(items) if len(name_query(item)) >= 3]
+    query_rows = rng.sample(candidates, min(QUERY_COUNT, len(candidates)))
+    if not query_rows:
+        print("No usable file names for queries")
+        return None
+
+    # Same model and mode the LEANN builder would use
+    builder = LeannBuilder(backend_name="hnsw", is_recompute=False)
+    model, mode = builder.embedding_model, builder.embedding_mode
+    exact_tokens = use_model_tokenizer(model)
+
+    queries = [name_query(items[row]) for row in query_rows]
+    query_vectors = normalize(compute_embeddings(queries, model, mode, use_server=False))
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'dump_file': dump_file,
+        'embedding_model': model,
+        'items': len(items),
+        'queries': len(queries),
+        'token_counts': 'model tokenizer' if exact_tokens else 'approximate',
+        'templates': [],
+    }
+    for template in TEMPLATES.values():
+        print(f"Evaluating {template.key}...")
+        results['templates'].append(evaluate_template(template, items, query_rows, query_vectors, model, mode))
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python template_benchmark.py <dump.json>")
+        sys.exit(1)
+    run_benchmark(sys.argv[1])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Checkpointed embedding for long index builds
+Embedded batches are saved to disk as they finish, so a build that dies near
+the end resumes from the last saved batch instead of re-embedding from item zero
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+PROGRESS_FILE = "progress.json"
+
+
+def build_key(texts, model, mode, batch_size):
+    """Fingerprint of everything that determines the embeddings of a build"""
+    digest = hashlib.sha256()
+    digest.update(f"{mode}\0{model}\0{batch_size}\0{len(texts)}\0".encode("utf-8"))
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class EmbeddingCheckpoint:
+    """Directory of embedded batches plus a progress file, one per build key"""
+
+    def __init__(self, checkpoint_root, key):
+        self.dir = Path(checkpoint_root) / key
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.progress_path = self.dir / PROGRESS_FILE
+        self.batches = self._load_progress()
+
+    def _load_progress(self):
+        """Batches recorded as complete whose files are still on disk"""
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                recorded = json.load(f)["batches"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return []
+
+        batches = []
+        for batch in recorded:
+            # Stop at the first missing file, everything after it gets re-embedded
+            if not (self.dir / batch["file"]).exists():
+                break
+            batches.append(batch)
+        return batches
+
+    @property
+    def items_done(self):
+        return sum(batch["count"] for batch in self.batches)
+
+    def save_batch(self, embeddings):
+        """Persist one embedded batch, then record it in the progress file"""
+        name = f"batch_{len(self.batches):06d}.npy"
+        tmp_path = self.dir / f"{name}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(embeddings, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.dir / name)
+
+        self.batches.append({"file": name, "count": len(embeddings)})
+        tmp_progress = self.dir / f"{PROGRESS_FILE}.tmp"
+        with open(tmp_progress, "w", encoding="utf-8") as f:
+            json.dump({"batches": self.batches}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_progress, self.progress_path)
+
+    def load_embeddings(self):
+        """All checkpointed embeddings in item order"""
+        return np.vstack([np.load(self.dir / batch["file"]) for batch in self.batches])
+
+    def clear(self):
+        """Remove the checkpoint once its index has been published"""
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,665 @@
+#!/usr/bin/env python3
+"""
+Directory crawler shared by the Linux and Windows dumpers
+Walks search folders with os.scandir and prunes ignored subtrees before they
+are listed, so .git, node_modules, virtualenvs etc. are never walked or stat'ed.
+An optional DirectoryCache lets rescans reuse the listing of every directory
+whose mtime hasn't changed since the previous crawl, and a CrawlCheckpoint lets
+an interrupted crawl resume from where it stopped.
+"""
+
+import hashlib
+import json
+import heapq
+import itertools
+import os
+import pickle
+import re
+import shutil
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+def _glob_to_regex(pattern):
+    """Translate one gitignore glob (without leading '!' or trailing '/') to a regex"""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex += f"[{body}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+FINGERPRINT_BLOCK = 4096
+
+
+def file_fingerprint(file_path, size):
+    """Cheap content fingerprint: size plus hash of the first and last block"""
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=12)
+    with open(file_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if size > 2 * FINGERPRINT_BLOCK:
+            f.seek(size - FINGERPRINT_BLOCK)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+        elif size > FINGERPRINT_BLOCK:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class IgnoreRules:
+    """gitignore-style exclude/include rules; the last matching rule wins
+
+    Supported syntax: '#' comments, '!' re-includes, trailing '/' for directories
+    only, a '/' elsewhere anchors the pattern to the directory that declared it,
+    '*', '?', '[...]' and '**'. Anchored patterns given here (the config list)
+    are anchored at each of roots, the search folders; without roots they raise
+    ValueError instead of silently never matching.
+    """
+
+    def __init__(self, patterns=(), base_dir="", ignore_file_names=(), roots=()):
+        self.ignore_file_names = tuple(ignore_file_names)
+        self.rules = []
+        self.add_patterns(patterns, base_dir, roots)
+
+    def add_patterns(self, patterns, base_dir, roots=()):
+        base_dir = base_dir.replace(os.sep, "/").rstrip("/")
+        roots = [root.replace(os.sep, "/").rstrip("/") for root in roots]
+        for line in patterns:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            regex = _glob_to_regex(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            bases = [base_dir]
+            if anchored and not base_dir:
+                if not roots:
+                    raise ValueError(f"ignore pattern '{line}' is anchored but has no folder to anchor at "
+                                     f"(pass the search folders as roots)")
+                bases = roots
+            for base in bases:
+                self.rules.append((re.compile(regex + "$"), negate, dir_only, base))
+
+    def for_directory(self, dir_path, names=None):
+        """Rules for dir_path's children: these plus any ignore files found in dir_path
+
+        names, when given, is the directory listing; ignore files not in it aren't opened.
+        """
+        extra = []
+        for name in self.ignore_file_names:
+            if names is not None and name not in names:
+                continue
+            try:
+                with open(os.path.join(dir_path, name), "r", encoding="utf-8", errors="replace") as f:
+                    extra.append(f.read().splitlines())
+            except OSError:
+                continue
+        if not extra:
+            return self
+
+        child = IgnoreRules(ignore_file_names=self.ignore_file_names)
+        child.rules = list(self.rules)
+        for patterns in extra:
+            child.add_patterns(patterns, dir_path)
+        return child
+
+    def ignored(self, path, is_dir):
+        path = path.replace(os.sep, "/")
+        ignored = False
+        for regex, negate, dir_only, base_dir in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base_dir:
+                if not path.startswith(base_dir + "/"):
+                    continue
+                relative = path[len(base_dir) + 1:]
+            else:
+                relative = path.lstrip("/")
+            if regex.match(relative):
+                ignored = not negate
+        return ignored
+
+
+class DirectoryCache:
+    """Directory listings and file records from the previous crawl
+
+    A directory whose mtime is unchanged has the same children, so its cached
+    listing is reused instead of calling scandir. Files still get an os.stat;
+    when size, mtime and ctime all match, the cached metadata record is reused.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.started_ns = time.time_ns()
+
+        # Previous crawl (read-only) and this crawl (saved at the end)
+        self.old_dirs = {}
+        self.old_records = {}
+        self.trusted_before_ns = 0
+        self.dirs = {}
+        self.records = {}
+
+        self.dirs_reused = 0
+        self.records_reused = 0
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+                if data.get("version") == self.VERSION:
+                    self.old_dirs = data["dirs"]
+                    self.old_records = data["records"]
+                    # A directory modified in the same clock tick as the previous crawl's
+                    # start may have changed after it was listed, so don't trust it
+                    self.trusted_before_ns = data["started_ns"] - 1_000_000_000
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+                print(f"Ignoring unreadable crawl cache {path}: {e}")
+
+    def listing(self, dir_path, mtime_ns):
+        """Cached [(name, is_dir, is_symlink), ...] for dir_path, or None if it changed"""
+        cached = self.old_dirs.get(dir_path)
+        if cached is None or cached[0] != mtime_ns or mtime_ns >= self.trusted_before_ns:
+            return None
+        self.dirs_reused += 1
+        self.dirs[dir_path] = cached
+        return cached[1]
+
+    def remember_listing(self, dir_path, mtime_ns, listing):
+        self.dirs[dir_path] = (mtime_ns, listing)
+
+    def record(self, file_path, st):
+        """Cached metadata record for file_path if its stat signature is unchanged"""
+        cached = self.old_records.get(file_path)
+        if cached is None or cached[0] != (st.st_size, st.st_mtime_ns, st.st_ctime_ns):
+            return None
+        self.records_reused += 1
+        self.records[file_path] = cached
+        return cached[1]
+
+    def remember_record(self, file_path, st, record):
+        self.records[file_path] = ((st.st_size, st.st_mtime_ns, st.st_ctime_ns), record)
+
+    def save(self):
+        """Write this crawl's listings and records for the next run"""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": self.VERSION,
+                "started_ns": self.started_ns,
+                "dirs": self.dirs,
+                "records": self.records,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+class CrawlCheckpoint:
+    """Periodic snapshot of an unfinished crawl, so a restart resumes from it
+
+    Records are appended to <prefix>.records.jsonl as they are emitted; every
+    `interval` seconds the pending directory frontier, the visited directories
+    and the stats are saved to <prefix>.state.pickle along with how much of the
+    records file they cover. Anything appended after the last snapshot is
+    discarded on resume, since the directories it came from are still pending.
+    `key` identifies the crawl configuration; a checkpoint with another key is ignored.
+    """
+
+    VERSION = 1
+
+    def __init__(self, prefix, key, interval=30.0):
+        self.state_path = f"{prefix}.state.pickle"
+        self.records_path = f"{prefix}.records.jsonl"
+        self.key = key
+        self.interval = interval
+        self.last_save = time.monotonic()
+        self.state = None
+        self.records_written = 0
+
+        try:
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == self.VERSION and state.get("key") == key:
+                self.state = state
+            else:
+                print(f"Ignoring crawl checkpoint {self.state_path}: different crawl settings")
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            print(f"Ignoring unreadable crawl checkpoint {self.state_path}: {e}")
+
+        self.records_file = open(self.records_path, "ab" if self.state else "wb")
+        if self.state:
+            # Drop records from directories that were still pending at the snapshot
+            self.records_file.truncate(self.state["records_offset"])
+            self.records_file.seek(self.state["records_offset"])
+
+    def resumed_records(self):
+        """Records emitted before the snapshot, with aliases found later applied"""
+        if not self.state:
+            return []
+        records = []
+        with open(self.records_path, "rb") as f:
+            data = f.read(self.state["records_offset"])
+        for line in data.splitlines():
+            entry = json.loads(line)
+            if "AliasOf" in entry:
+                records[entry["AliasOf"]].setdefault("Aliases", []).append(entry["Path"])
+            else:
+                records.append(entry)
+        self.records_written = len(records)
+        return records
+
+    def add_record(self, record):
+        """Append an emitted record; returns its index for add_alias"""
+        self.records_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.records_written += 1
+        return self.records_written - 1
+
+    def add_alias(self, index, path):
+        """Record another path of an already-written record"""
+        self.records_file.write(json.dumps({"AliasOf": index, "Path": path}, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def maybe_save(self, frontier, visited_dirs, stats, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_save < self.interval:
+            return
+        self.last_save = now
+        self.records_file.flush()
+        os.fsync(self.records_file.fileno())
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": self.VERSION,
+                "key": self.key,
+                "frontier": frontier,
+                "visited_dirs": visited_dirs,
+                "stats": stats.__dict__,
+                "records_offset": self.records_file.tell(),
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def clear(self):
+        """Remove the checkpoint once the crawl's output has been written"""
+        self.records_file.close()
+        for path in (self.state_path, self.records_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class IOThrottle:
+    """Rate caps per operation kind ('stat', 'dir') plus optional adaptive backoff
+
+    Every operation first waits for its kind's next slot (no bursts), then for
+    the current backoff. With backoff enabled, an operation slower than
+    slow_factor times its kind's baseline latency (a slow moving average, after
+    BASELINE_OPS operations) doubles the backoff up to max_backoff; fast ones
+    halve it again. A filesystem that is uniformly slow (NFS, spinning disks)
+    raises the baseline instead of triggering the backoff.
+    """
+
+    BASELINE_OPS = 20
+    BASELINE_WEIGHT = 0.01
+
+    def __init__(self, stats_per_sec=None, dirs_per_sec=None, backoff=False, slow_factor=4.0, max_backoff=1.0):
+        self.rates = {'stat': stats_per_sec, 'dir': dirs_per_sec}
+        self.adaptive = backoff
+        self.slow_factor = slow_factor
+        self.max_backoff = max_backoff
+        self.next_slot = {}
+        self.backoff = 0.0
+        # kind -> [operations seen, average latency]
+        self.baseline = {}
+
+        self.slow_ops = 0
+        self.sleep_seconds = 0.0
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.sleep_seconds += seconds
+
+    @contextmanager
+    def op(self, kind):
+        rate = self.rates.get(kind)
+        if rate:
+            now = time.monotonic()
+            slot = max(self.next_slot.get(kind, now), now)
+            self._sleep(slot - now)
+            self.next_slot[kind] = slot + 1.0 / rate
+        self._sleep(self.backoff)
+
+        if not self.adaptive:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._observe(kind, time.monotonic() - start)
+
+    def _observe(self, kind, elapsed):
+        seen, average = self.baseline.get(kind, (0, elapsed))
+        slow = seen >= self.BASELINE_OPS and elapsed > average * self.slow_factor
+        # Plain mean while warming up, then a slow moving average
+        weight = 1.0 / (seen + 1) if seen < self.BASELINE_OPS else self.BASELINE_WEIGHT
+        self.baseline[kind] = (seen + 1, average + (elapsed - average) * weight)
+        if slow:
+            self.slow_ops += 1
+            self.backoff = min(self.max_backoff, max(self.backoff * 2, 0.001))
+        elif self.backoff:
+            self.backoff = self.backoff / 2 if self.backoff > 0.0001 else 0.0
+
+    def report(self):
+        print(f"  Throttle: slept {self.sleep_seconds:.1f}s, {self.slow_ops} slow filesystem operations")
+
+
+def set_idle_priority():
+    """Lower this process to idle CPU and (where available) idle I/O priority"""
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass
+    if hasattr(os, "sched_setscheduler") and hasattr(os, "SCHED_IDLE"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+        except OSError:
+            pass
+    # No stdlib call for I/O priority; util-linux's ionice sets the idle class
+    ionice = shutil.which("ionice")
+    if ionice:
+        subprocess.run([ionice, "-c", "3", "-p", str(os.getpid())],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+
+class CrawlProgress:
+    """Periodic one-line progress with rate and ETA
+
+    expected_files is usually the file count of the previous crawl; without it
+    only the rate is shown.
+    """
+
+    def __init__(self, expected_files=None, interval=1.0):
+        self.expected_files = expected_files
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_print = 0.0
+
+    def update(self, files_done, stats, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_print < self.interval:
+            return
+        self.last_print = now
+        elapsed = now - self.started
+        rate = files_done / elapsed if elapsed > 0 else 0.0
+        line = f"\r  {files_done} files, {stats.dirs_scanned} dirs, {rate:.0f} files/s"
+        if self.expected_files and rate > 0:
+            remaining = max(self.expected_files - files_done, 0)
+            percent = min(files_done / self.expected_files * 100, 100.0)
+            line += f", ~{percent:.0f}% ETA {remaining / rate:.0f}s"
+        sys.stdout.write(line + "   ")
+        sys.stdout.flush()
+
+
+class CrawlStats:
+    """What a crawl visited and what it skipped"""
+
+    def __init__(self):
+        self.dirs_scanned = 0
+        self.dirs_pruned = 0
+        self.dirs_cached = 0
+        self.dirs_duplicate = 0
+        self.dirs_other_device = 0
+        self.files_ignored = 0
+        self.files_aliased = 0
+        self.errors = 0
+        self.stopped_early = False  # max_items / scan budget hit before the tree was done
+        self.pruned_names = Counter()
+
+    def report(self):
+        print(f"Crawl: {self.dirs_scanned} directories scanned "
+              f"({self.dirs_cached} unchanged since last crawl), "
+              f"{self.dirs_pruned} pruned, {self.files_ignored} files ignored, "
+              f"{self.errors} unreadable")
+        if self.dirs_duplicate or self.dirs_other_device or self.files_aliased:
+            print(f"  Skipped {self.dirs_duplicate} already-visited directories (symlinks/bind mounts), "
+                  f"{self.dirs_other_device} on other filesystems, "
+                  f"{self.files_aliased} hardlink/symlink aliases of indexed files")
+        if self.pruned_names:
+            top = ", ".join(f"{name} x{count}" for name, count in self.pruned_names.most_common(5))
+            print(f"  Most pruned: {top}")
+
+
+_NO_THROTTLE = IOThrottle()
+
+
+def list_directory(dir_path):
+    """[(name, is_dir, is_symlink), ...] for one directory, os.walk style (is_dir follows links)"""
+    listing = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            listing.append((entry.name, is_dir, entry.is_symlink()))
+    return listing
+
+
+class NewestFiles:
+    """Bounded min-heap keeping the `limit` records with the newest mtime"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.heap = []
+        self.seq = itertools.count()  # tie-breaker, records themselves aren't comparable
+
+    def offer(self, mtime, record):
+        """Keep record if it is among the newest seen so far; returns False if dropped"""
+        entry = (mtime, next(self.seq), record)
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, entry)
+            return True
+        if mtime <= self.heap[0][0]:
+            return False
+        heapq.heapreplace(self.heap, entry)
+        return True
+
+    @property
+    def oldest_mtime(self):
+        """mtime a file must beat to get in, or None while the heap isn't full"""
+        return self.heap[0][0] if len(self.heap) >= self.limit else None
+
+    def newest_first(self):
+        return [record for _, _, record in sorted(self.heap, key=lambda e: (-e[0], e[1]))]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class _StackFrontier:
+    """Depth-first, listing order (what os.walk yields)"""
+
+    def __init__(self):
+        self.stack = []
+
+    def push_children(self, entries):
+        # Reversed so directories come off the stack in listing order, like os.walk
+        self.stack.extend(reversed(entries))
+
+    def pop(self):
+        return self.stack.pop()
+
+    def pending(self):
+        """Entries in the order they would be popped"""
+        return self.stack[::-1]
+
+    def __bool__(self):
+        return bool(self.stack)
+
+
+class _RecentFrontier:
+    """Most recently modified directory first, across all search folders"""
+
+    def __init__(self):
+        self.heap = []
+        self.seq = itertools.count()
+
+    def push_children(self, entries):
+        for entry in entries:
+            dir_stat = entry[3]
+            mtime = dir_stat.st_mtime_ns if dir_stat is not None else 0
+            heapq.heappush(self.heap, (-mtime, next(self.seq), entry))
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2]
+
+    def pending(self):
+        """Entries in the order they would be popped"""
+        return [entry for _, _, entry in sorted(self.heap, key=lambda e: e[:2])]
+
+    def __bool__(self):
+        return bool(self.heap)
+
+
+def walk_files(search_paths, rules=None, stats=None, dir_cache=None,
+               follow_symlinks=False, one_filesystem=False, dedupe_dirs=False, throttle=None,
+               newest_first=False, checkpoint=None):
+    """Yield file paths under search_paths, never descending into ignored directories
+
+    With default arguments this is the same view of the tree as os.walk: symlinked
+    directories are not followed, everything that isn't a directory is yielded.
+
+    follow_symlinks: descend into symlinked directories; loops are impossible
+        because every physical directory (st_dev, st_ino) is walked only once
+    one_filesystem: don't cross into directories on another device than their root
+    dedupe_dirs: also walk bind-mounted / otherwise aliased directories only once
+    throttle: IOThrottle applied to every directory stat and listing
+    newest_first: visit directories in order of their mtime, newest first, so a
+        crawl stopped early has seen the recently active parts of the tree. A
+        directory's mtime changes when entries are added, removed or renamed in it,
+        which is what saving most files does; files edited in place don't bump it.
+    checkpoint: CrawlCheckpoint; the walk resumes from its saved frontier and
+        saves a new one between directories
+    """
+    rules = rules or IgnoreRules()
+    stats = stats or CrawlStats()
+    throttle = throttle or _NO_THROTTLE
+    track_dirs = follow_symlinks or one_filesystem or dedupe_dirs
+    need_stat = track_dirs or dir_cache is not None or newest_first
+    visited_dirs = set()
+
+    def stat_child(path):
+        # Priority of a directory waiting in the newest-first frontier
+        try:
+            with throttle.op('stat'):
+                return os.stat(path)
+        except OSError:
+            return None
+
+    # Entries: (dir_path, parent_rules, root_device, dir_stat or None)
+    frontier = _RecentFrontier() if newest_first else _StackFrontier()
+    if checkpoint is not None and checkpoint.state is not None:
+        frontier.push_children(checkpoint.state["frontier"])
+        visited_dirs = checkpoint.state["visited_dirs"]
+        stats.__dict__.update(checkpoint.state["stats"])
+    else:
+        frontier.push_children([(root_path, rules, None, stat_child(root_path) if newest_first else None)
+                                for root_path in search_paths])
+
+    while frontier:
+        # Between directories everything yielded so far has been consumed,
+        # so frontier + records form a consistent snapshot
+        if checkpoint is not None:
+            checkpoint.maybe_save(frontier.pending(), visited_dirs, stats)
+        dir_path, parent_rules, root_device, dir_stat = frontier.pop()
+        try:
+            if dir_stat is None and need_stat:
+                with throttle.op('stat'):
+                    dir_stat = os.stat(dir_path)
+            if root_device is None and dir_stat is not None:
+                root_device = dir_stat.st_dev
+            if track_dirs:
+                if one_filesystem and dir_stat.st_dev != root_device:
+                    stats.dirs_other_device += 1
+                    continue
+                key = (dir_stat.st_dev, dir_stat.st_ino)
+                if key in visited_dirs:
+                    stats.dirs_duplicate += 1
+                    continue
+                visited_dirs.add(key)
+
+            listing = None
+            if dir_cache is not None:
+                mtime_ns = dir_stat.st_mtime_ns
+                listing = dir_cache.listing(dir_path, mtime_ns)
+                if listing is not None:
+                    stats.dirs_cached += 1
+            if listing is None:
+                with throttle.op('dir'):
+                    listing = list_directory(dir_path)
+                if dir_cache is not None:
+                    dir_cache.remember_listing(dir_path, mtime_ns, listing)
+        except OSError:
+            stats.errors += 1
+            continue
+        stats.dirs_scanned += 1
+        dir_rules = parent_rules.for_directory(dir_path, {name for name, _, _ in listing})
+
+        subdirs = []
+        for name, is_dir, is_symlink in listing:
+            path = os.path.join(dir_path, name)
+            if dir_rules.ignored(path, is_dir):
+                if is_dir:
+                    stats.dirs_pruned += 1
+                    stats.pruned_names[name] += 1
+                else:
+                    stats.files_ignored += 1
+                continue
+            if is_dir:
+                if follow_symlinks or not is_symlink:
+                    subdirs.append((path, dir_rules, root_device, stat_child(path) if newest_first else None))
+            else:
+                yield path
+
+        frontier.push_children(subdirs)
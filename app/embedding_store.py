@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Per-generation store of passage ids, file identities, embedding texts and vectors
+Saved next to each LEANN index so the next build can reuse embeddings and ids
+of files that are unchanged or were only moved/renamed
+"""
+
+import json
+import os
+
+import numpy as np
+
+VECTORS_SUFFIX = ".vectors.npy"
+ITEMS_SUFFIX = ".items.json"
+
+
+def item_identity(item):
+    """(device, inode, content fingerprint) key for a dump item, or None if not recorded"""
+    if item.get('Inode') is None or not item.get('Fingerprint'):
+        return None
+    return f"{item.get('Device')}:{item['Inode']}:{item['Fingerprint']}"
+
+
+def save_store(index_path, ids, identities, paths, texts, embeddings, template=None,
+               embedding_model=None, embedding_mode=None):
+    """Write the store for a freshly built index; template is the embedding template key
+
+    embeddings=None writes ids, identities and texts only: the next build keeps
+    ids but re-embeds every item.
+    """
+    if embeddings is not None:
+        vectors_tmp = f"{index_path}{VECTORS_SUFFIX}.tmp"
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.asarray(embeddings, dtype=np.float32))
+        os.replace(vectors_tmp, f"{index_path}{VECTORS_SUFFIX}")
+
+    with open(f"{index_path}{ITEMS_SUFFIX}", "w", encoding="utf-8") as f:
+        json.dump({'ids': ids, 'identities': identities, 'paths': paths, 'texts': texts,
+                   'template': template, 'embedding_model': embedding_model,
+                   'embedding_mode': embedding_mode}, f, ensure_ascii=False)
+
+
+class EmbeddingStore:
+    """Read side of a previous generation's store"""
+
+    def __init__(self, index_path):
+        with open(f"{index_path}{ITEMS_SUFFIX}", "r", encoding="utf-8") as f:
+            items = json.load(f)
+        self.ids = items['ids']
+        self.paths = items['paths']
+        self.texts = items['texts']
+        self.template = items.get('template')
+        self.embedding_model = items.get('embedding_model')
+        self.embedding_mode = items.get('embedding_mode')
+        # None for stores saved without vectors (recompute-mode builds)
+        vectors_path = f"{index_path}{VECTORS_SUFFIX}"
+        self.vectors = np.load(vectors_path, mmap_mode='r') if os.path.exists(vectors_path) else None
+
+        self.by_identity = {key: row for row, key in enumerate(items['identities']) if key}
+        self.by_text = {text: row for row, text in enumerate(self.texts)}
+
+    @classmethod
+    def load(cls, index_path):
+        """Store saved with index_path, or None for indexes built without one"""
+        if index_path is None or not os.path.exists(f"{index_path}{ITEMS_SUFFIX}"):
+            return None
+        try:
+            return cls(index_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding store at {index_path}: {e}")
+            return None
+
+    def same_model(self, embedding_model, embedding_mode):
+        """Whether the vectors came from this model (unknown for stores that didn't record it)"""
+        return self.embedding_model == embedding_model and self.embedding_mode == embedding_mode
+
+    def next_id(self):
+        """First integer passage id not used by this store"""
+        numeric = [int(i) for i in self.ids if str(i).isdigit()]
+        return max(numeric) + 1 if numeric else 0
+
+    def match(self, identity, path, text):
+        """Row of a previous item this one can reuse, plus whether it is a move
+
+        Identity match: same physical file, possibly at a new path. Its id is kept;
+        its vector only if the embedding text didn't change (path-insensitive text).
+        Text match: unchanged file without identity info; id and vector are kept.
+        Returns (row, reuse_vector, moved) or (None, False, False).
+        """
+        if identity is not None and identity in self.by_identity:
+            row = self.by_identity[identity]
+            return row, self.texts[row] == text, self.paths[row] != path
+        row = self.by_text.get(text)
+        if row is not None:
+            return row, True, False
+        return None, False, False
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Named, versioned templates for the text each file is embedded as
+Every token of the embedding text goes through the encoder for every file, so
+templates can cap each field (paths keep their last components, other fields
+their start) and the whole text to a token budget. A template's key
+("name@vN") is stored with the index; bump the version whenever the output of
+a template changes so nobody compares embeddings made from different texts.
+"""
+
+import math
+import os
+import re
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_SPLIT = re.compile(r"(\w+|[^\w\s]|\s+)")
+
+# Fields that are truncated from the front, keeping their most specific end
+_TAIL_FIELDS = {"Path", "Folder"}
+
+
+def approx_tokens(text):
+    """Rough WordPiece/BPE token count: words cost ~1 token per 4 chars, punctuation 1 each"""
+    return sum(math.ceil(len(piece) / 4) for piece in _PIECES.findall(text))
+
+
+# Swapped for a real tokenizer's counter by set_token_counter
+_count_tokens = approx_tokens
+
+
+def set_token_counter(count_tokens):
+    """Use count_tokens(text) -> int (e.g. the embedding model's tokenizer) for budgets"""
+    global _count_tokens
+    _count_tokens = count_tokens or approx_tokens
+
+
+def count_tokens(text):
+    return _count_tokens(text)
+
+
+def truncate_tokens(text, max_tokens, keep_tail=False):
+    """Cut text to about max_tokens, keeping its start (or its end with keep_tail)
+
+    Words and punctuation are costed one at a time with the current token counter.
+    """
+    if max_tokens is None or _count_tokens(text) <= max_tokens:
+        return text
+    parts = [p for p in _SPLIT.split(text) if p]
+    if keep_tail:
+        parts.reverse()
+    kept = []
+    used = 0
+    for part in parts:
+        cost = 0 if part.isspace() else _count_tokens(part)
+        if used + cost > max_tokens:
+            break
+        kept.append(part)
+        used += cost
+    if keep_tail:
+        kept.reverse()
+        return "…" + "".join(kept).lstrip()
+    return "".join(kept).rstrip() + "…"
+
+
+def _human_size(size):
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return "unknown size"
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def item_fields(item):
+    """All fields a template can use, from one dump item"""
+    path = str(item.get('Path', 'unknown'))
+    return {
+        'Name': str(item.get('Name', 'unknown')),
+        'Path': path,
+        'Folder': os.path.dirname(path) or path,
+        'Size': str(item.get('Size', 'unknown')),
+        'SizeHuman': _human_size(item.get('Size')),
+        'ContentType': str(item.get('ContentType', 'unknown')),
+        'Kind': str(item.get('Kind', 'unknown')),
+    }
+
+
+class EmbeddingTemplate:
+    """A format string over item_fields plus per-field and total token limits
+
+    field_tokens: {field: max tokens}; shrink: fields cut further, in order, when
+    the rendered text is over token_budget.
+    """
+
+    def __init__(self, name, version, fmt, field_tokens=None, token_budget=None, shrink=()):
+        self.name = name
+        self.version = version
+        self.fmt = fmt
+        self.field_tokens = field_tokens or {}
+        self.token_budget = token_budget
+        self.shrink = tuple(shrink)
+
+    @property
+    def key(self):
+        return f"{self.name}@v{self.version}"
+
+    def _render(self, fields, limits):
+        values = {name: truncate_tokens(value, limits.get(name), keep_tail=name in _TAIL_FIELDS)
+                  for name, value in fields.items()}
+        return self.fmt.format_map(values)
+
+    def render(self, item):
+        """Embedding text for one dump item"""
+        fields = item_fields(item)
+        limits = dict(self.field_tokens)
+        text = self._render(fields, limits)
+        if self.token_budget is None:
+            return text
+
+        for name in self.shrink:
+            over = _count_tokens(text) - self.token_budget
+            if over <= 0:
+                return text
+            current = limits.get(name) or _count_tokens(fields[name])
+            limits[name] = max(current - over, 2)
+            text = self._render(fields, limits)
+        return truncate_tokens(text, self.token_budget)
+
+
+TEMPLATES = {}
+
+
+def register_template(template):
+    TEMPLATES[template.name] = template
+    return template
+
+
+# The sentence leann_index_builder.py has always embedded
+register_template(EmbeddingTemplate(
+    "sentence", 1,
+    "{Name} located at {Path} and size {Size} bytes with content type {ContentType} and kind {Kind}",
+))
+
+# The sentence chroma_index_builder.py has always embedded
+register_template(EmbeddingTemplate(
+    "chroma", 1,
+    "{Name} located at {Path} of type {Kind}",
+))
+
+# Name, the last folders of the path, kind and a readable size
+register_template(EmbeddingTemplate(
+    "compact", 1,
+    "{Name} in {Folder} ({Kind}, {SizeHuman})",
+    field_tokens={'Name': 24, 'Folder': 16},
+    token_budget=48,
+    shrink=('Folder', 'Name'),
+))
+
+# Cheapest: name and the innermost folders only
+register_template(EmbeddingTemplate(
+    "name-folder", 1,
+    "{Name} {Folder}",
+    field_tokens={'Name': 24, 'Folder': 8},
+    token_budget=32,
+    shrink=('Folder', 'Name'),
+))
+
+
+def get_template(spec):
+    """Template for "name" or "name@vN"; the version must match the registered one"""
+    name, _, version = spec.partition("@v")
+    template = TEMPLATES.get(name)
+    if template is None:
+        raise ValueError(f"unknown embedding template '{name}' (available: {', '.join(sorted(TEMPLATES))})")
+    if version and int(version) != template.version:
+        raise ValueError(f"embedding template '{name}' is at v{template.version}, not v{version}")
+    return template
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Exact (brute-force) NumPy index, a third backend beside LEANN/HNSW and Chroma
+Stores L2-normalized embeddings (or int8 / PQ codes of them) as one .npy matrix
+that is memory-mapped at load time, and answers queries with a blocked matrix
+product plus argpartition.
+Up to ~100k files this is as fast as a graph search, builds instantly and is
+always exact. ExactSearcher exposes the parts of LeannSearcher that
+leann_query.py uses, so the search script and benchmarks work unchanged.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from mapped_index import MappedSearcher, map_file, map_npy
+from vector_quantization import (train_int8, encode_int8, int8_scorer, train_pq, encode_pq, pq_scorer,
+                                 train_pca, project_pca)
+
+META_SUFFIX = ".exact.json"
+VECTORS_SUFFIX = ".exact.npy"
+IDS_SUFFIX = ".exact.ids.npy"
+PASSAGES_SUFFIX = ".exact.passages.jsonl"
+OFFSETS_SUFFIX = ".exact.offsets.npy"
+# Quantized indexes: full-precision vectors for reranking, int8 scales, PQ codebooks
+FULL_SUFFIX = ".exact.full.npy"
+SCALE_SUFFIX = ".exact.scale.npy"
+CODEBOOKS_SUFFIX = ".exact.codebooks.npy"
+# Two-stage indexes: low-dimensional vectors for the first pass, PCA mean and components
+COARSE_SUFFIX = ".exact.coarse.npy"
+PCA_MEAN_SUFFIX = ".exact.pca_mean.npy"
+PCA_COMPONENTS_SUFFIX = ".exact.pca_components.npy"
+
+# Rows scored per matrix product; bounds the temporary score matrix
+BLOCK_ROWS = 65536
+
+# Ask the OS to start reading the whole vector matrix in the background on open;
+# the first query then doesn't wait for the disk (costs page cache up front)
+PREFETCH_VECTORS = False
+
+# Quantized search reranks top_k * RERANK_FACTOR candidates with full-precision vectors.
+# PQ codes rank much more coarsely than int8 (recall@10 ~0.8 at 4x, ~1.0 at 16x).
+RERANK_FACTOR = 4
+PQ_RERANK_FACTOR = 16
+
+# Two-stage search: candidates from the low-dimensional pass rescored at full dimension.
+# More candidates, better recall and slower; 0 scans the full vectors instead.
+COARSE_CANDIDATES = 256
+
+
+def is_exact_index(index_path):
+    return os.path.exists(f"{index_path}{META_SUFFIX}")
+
+
+def normalize_rows(matrix):
+    """Float32 copy of matrix with unit-length rows (zero rows stay zero)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def build_exact_index(index_path, ids, embeddings, chunks, embedding_model, embedding_mode,
+                      embedding_options=None, dtype="float32", quantization=None, keep_full=True,
+                      coarse_dims=None, coarse_method="pca"):
+    """Write an exact index for passages chunks[i] with vector embeddings[i] and id ids[i]
+
+    chunks are LeannBuilder.chunks-style dicts with "text" and "metadata".
+    dtype "float16" halves the matrix at a small precision cost.
+    quantization "int8" or "pq" stores compact codes that are scanned instead of
+    the matrix (see vector_quantization.py); with keep_full the full-precision
+    vectors stay on disk to rerank the best candidates exactly.
+    coarse_dims adds a first search pass over vectors cut down to that many
+    dimensions, by PCA or, with coarse_method "truncate", by keeping the first
+    ones (for models trained to allow it); its candidates are rescored at full dimension.
+    """
+    if len(ids) != len(embeddings) or len(ids) != len(chunks):
+        raise ValueError(f"{len(ids)} ids, {len(embeddings)} embeddings and {len(chunks)} passages don't match")
+    if coarse_dims and quantization is not None and not keep_full:
+        raise ValueError("a coarse pass is rescored with the full vectors; it needs keep_full with quantization")
+
+    vectors = normalize_rows(embeddings).astype(dtype)
+    if quantization is None:
+        _save_npy(f"{index_path}{VECTORS_SUFFIX}", vectors)
+    elif quantization == "int8":
+        scale = train_int8(vectors)
+        _save_npy(f"{index_path}{SCALE_SUFFIX}", scale)
+        _save_npy(f"{index_path}{VECTORS_SUFFIX}", encode_int8(vectors, scale))
+    elif quantization == "pq":
+        codebooks = train_pq(vectors)
+        _save_npy(f"{index_path}{CODEBOOKS_SUFFIX}", codebooks)
+        _save_npy(f"{index_path}{VECTORS_SUFFIX}", encode_pq(vectors, codebooks))
+    else:
+        raise ValueError(f"unknown quantization '{quantization}' (use None, 'int8' or 'pq')")
+    rerank = quantization is not None and keep_full
+    if rerank:
+        _save_npy(f"{index_path}{FULL_SUFFIX}", vectors)
+
+    coarse = None
+    if coarse_dims:
+        if coarse_method == "pca":
+            mean, components = train_pca(vectors, coarse_dims)
+            _save_npy(f"{index_path}{PCA_MEAN_SUFFIX}", mean)
+            _save_npy(f"{index_path}{PCA_COMPONENTS_SUFFIX}", components)
+            coarse_vectors = project_pca(vectors, mean, components)
+        elif coarse_method == "truncate":
+            coarse_vectors = vectors[:, :coarse_dims]
+        else:
+            raise ValueError(f"unknown coarse_method '{coarse_method}' (use 'pca' or 'truncate')")
+        _save_npy(f"{index_path}{COARSE_SUFFIX}", np.ascontiguousarray(coarse_vectors, dtype=dtype))
+        coarse = {"dims": int(coarse_dims), "method": coarse_method}
+    _save_npy(f"{index_path}{IDS_SUFFIX}", np.array([str(i) for i in ids]))
+
+    # Passages as JSON lines plus N+1 byte offsets, so one passage is one read
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    with open(f"{index_path}{PASSAGES_SUFFIX}", "wb") as f:
+        for row, (passage_id, chunk) in enumerate(zip(ids, chunks)):
+            line = json.dumps({"id": str(passage_id), "text": chunk["text"],
+                               "metadata": chunk.get("metadata", {})}, ensure_ascii=False)
+            f.write(line.encode("utf-8") + b"\n")
+            offsets[row + 1] = f.tell()
+    _save_npy(f"{index_path}{OFFSETS_SUFFIX}", offsets)
+
+    meta = {
+        "backend_name": "exact",
+        "version": 1,
+        "embedding_model": embedding_model,
+        "embedding_mode": embedding_mode,
+        "embedding_options": embedding_options or {},
+        "dimensions": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "dtype": str(vectors.dtype),
+        "quantization": quantization,
+        "rerank": rerank,
+        "coarse": coarse,
+    }
+    # Written last: an index without its meta file is never opened
+    with open(f"{index_path}{META_SUFFIX}", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def blocked_top_k(n_rows, score_block, queries, top_k, row_mask=None, block_rows=BLOCK_ROWS, deadline=None):
+    """(rows, scores), each (Q, <=top_k), of the highest scores per query
+
+    score_block(start, end, queries) returns the (Q, end - start) scores of one
+    block of rows; only one block of scores is held at a time.
+    row_mask: optional boolean (N,) array; False rows are never returned
+    deadline: optional query_deadline.Deadline; once it expires the best rows of
+    the blocks scanned so far are returned
+    """
+    n_queries = queries.shape[0]
+    top_k = min(top_k, n_rows)
+    best_rows = np.empty((n_queries, 0), dtype=np.int64)
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+    if top_k <= 0:
+        return best_rows, best_scores
+
+    for start in range(0, n_rows, block_rows):
+        if start and deadline is not None and deadline.expired():
+            deadline.cut_short("scan")
+            break
+        end = min(start + block_rows, n_rows)
+        scores = score_block(start, end, queries)
+        if row_mask is not None:
+            scores[:, ~row_mask[start:end]] = -np.inf
+
+        k = min(top_k, scores.shape[1])
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        cand_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+        cand_rows = np.concatenate([best_rows, part + start], axis=1)
+        if cand_scores.shape[1] > top_k:
+            keep = np.argpartition(-cand_scores, top_k - 1, axis=1)[:, :top_k]
+            cand_scores = np.take_along_axis(cand_scores, keep, axis=1)
+            cand_rows = np.take_along_axis(cand_rows, keep, axis=1)
+        best_scores, best_rows = cand_scores, cand_rows
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def matrix_scorer(vectors):
+    """score_block for a plain (N, D) normalized matrix, float32 or float16"""
+    def score_block(start, end, queries):
+        return queries @ np.asarray(vectors[start:end], dtype=np.float32).T
+    return score_block
+
+
+def exact_top_k(vectors, queries, top_k, row_mask=None, block_rows=BLOCK_ROWS):
+    """(rows, scores), each (Q, <=top_k), of the highest cosine scores per query
+
+    vectors: (N, D) normalized matrix (may be a memmap, float32 or float16)
+    queries: (Q, D) query embeddings, normalized here
+    """
+    return blocked_top_k(vectors.shape[0], matrix_scorer(vectors), normalize_rows(queries),
+                         top_k, row_mask, block_rows)
+
+
+def rerank(full_vectors, queries, rows, top_k):
+    """Re-score candidate rows (Q, R) with full-precision vectors; returns the best top_k"""
+    out_rows, out_scores = [], []
+    for query, candidates in zip(queries, rows):
+        # Sorted reads keep the memory-mapped access sequential
+        candidates = np.unique(candidates)
+        scores = np.asarray(full_vectors[candidates], dtype=np.float32) @ query
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        out_rows.append(candidates[best])
+        out_scores.append(scores[best])
+    return out_rows, out_scores
+
+
+class _ExactPassages:
+    """passage_manager stand-in: passages sliced by byte offset out of a mapped file"""
+
+    def __init__(self, index_path, ids):
+        self.ids = ids
+        self.offsets = map_npy(f"{index_path}{OFFSETS_SUFFIX}", "random")
+        self.data = map_file(f"{index_path}{PASSAGES_SUFFIX}", "random")
+        self.row_of = None
+        self.recent_rows = {}  # id -> row for the latest search results
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, passage_id):
+        row = self.recent_rows.get(passage_id)
+        if row is None:
+            if self.row_of is None:
+                # Built once, on the first lookup of an id that wasn't just returned
+                self.row_of = {str(passage_id): row for row, passage_id in enumerate(self.ids)}
+            row = self.row_of[str(passage_id)]
+        return row
+
+    def get_row(self, row):
+        if self.data is None:
+            # Empty passages file (map_file can't map it): no passage exists
+            raise KeyError(f"Passage row not found: {row}")
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self.data[start:end])
+
+    def get_passage(self, passage_id):
+        return self.get_row(self.row(passage_id))
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+
+
+class _ExactBackend:
+    """backend_impl stand-in: query encoding and brute-force search"""
+
+    def __init__(self, searcher):
+        self.searcher = searcher
+
+    def compute_query_embedding(self, query, use_server_if_available=False, zmq_port=None, query_template=None):
+        from leann.api import compute_embeddings
+
+        if query_template:
+            query = f"{query_template}{query}"
+        searcher = self.searcher
+        return compute_embeddings([query], searcher.embedding_model, searcher.embedding_mode,
+                                  use_server=False, provider_options=searcher.embedding_options)
+
+    def search(self, query, top_k, complexity=None, recompute_embeddings=False, id_mask=None,
+               candidates=None, deadline=None, **kwargs):
+        """LEANN-style {"labels": [[ids]], "distances": [[scores]]}, one list per query row
+
+        id_mask: boolean row mask, or a collection of passage ids allowed in the results
+        candidates: first-pass candidates for two-stage indexes (default COARSE_CANDIDATES)
+        deadline: optional query_deadline.Deadline the scan stops at
+        """
+        searcher = self.searcher
+        row_mask = searcher.row_mask(id_mask) if id_mask is not None else None
+        rows, scores = searcher.search_rows(query, top_k, row_mask, candidates=candidates, deadline=deadline)
+
+        labels, distances = [], []
+        recent = {}
+        for query_rows, query_scores in zip(rows, scores):
+            query_rows, query_scores = np.asarray(query_rows), np.asarray(query_scores)
+            valid = np.isfinite(query_scores)
+            ids = [str(searcher.ids[row]) for row in query_rows[valid]]
+            recent.update(zip(ids, (int(r) for r in query_rows[valid])))
+            labels.append(ids)
+            distances.append(query_scores[valid].tolist())
+        searcher.passage_manager.recent_rows = recent
+        return {"labels": labels, "distances": distances}
+
+
+class ExactSearcher:
+    """Loaded exact index with the LeannSearcher attributes leann_query.py relies on"""
+
+    def __init__(self, index_path):
+        with open(f"{index_path}{META_SUFFIX}", "r", encoding="utf-8") as f:
+            self.meta_data = json.load(f)
+        self.index_path = index_path
+        self.embedding_model = self.meta_data["embedding_model"]
+        self.embedding_mode = self.meta_data.get("embedding_mode", "sentence-transformers")
+        self.embedding_options = self.meta_data.get("embedding_options") or {}
+
+        # Memory-mapped: opening costs the same for any index size
+        self.vectors = map_npy(f"{index_path}{VECTORS_SUFFIX}", "willneed" if PREFETCH_VECTORS else None)
+        self.ids = map_npy(f"{index_path}{IDS_SUFFIX}", "random")
+        self.passage_manager = _ExactPassages(index_path, self.ids)
+        self.backend_impl = _ExactBackend(self)
+
+        quantization = self.meta_data.get("quantization")
+        if quantization == "int8":
+            self.score_block = int8_scorer(self.vectors, np.load(f"{index_path}{SCALE_SUFFIX}"))
+        elif quantization == "pq":
+            self.score_block = pq_scorer(self.vectors, np.load(f"{index_path}{CODEBOOKS_SUFFIX}"))
+        else:
+            self.score_block = matrix_scorer(self.vectors)
+        self.full_vectors = None
+        if self.meta_data.get("rerank"):
+            # Only a few candidate rows are read per query
+            self.full_vectors = map_npy(f"{index_path}{FULL_SUFFIX}", "random")
+
+        self.coarse = self.meta_data.get("coarse")
+        self.coarse_vectors = self.pca = None
+        if self.coarse:
+            self.coarse_vectors = map_npy(f"{index_path}{COARSE_SUFFIX}",
+                                          "willneed" if PREFETCH_VECTORS else None)
+            if self.coarse["method"] == "pca":
+                self.pca = np.load(f"{index_path}{PCA_COMPONENTS_SUFFIX}")
+            # Unquantized indexes rescore from the scanned matrix itself, rows at random
+            if self.full_vectors is None:
+                self.full_vectors = map_npy(f"{index_path}{VECTORS_SUFFIX}", "random")
+
+    def project(self, queries):
+        """Normalized queries in the coarse vectors' space
+
+        Stored vectors are centred before projecting, queries aren't: the mean only
+        adds the same q . mean to every score of a query, so rankings don't change.
+        """
+        if self.pca is not None:
+            return queries @ self.pca
+        return np.ascontiguousarray(queries[:, :self.coarse["dims"]])
+
+    def search_rows(self, queries, top_k, row_mask=None, rerank_factor=None, candidates=None,
+                    deadline=None):
+        """(rows, scores) per query
+
+        Two-stage indexes take candidates from the coarse pass, quantized ones from
+        the codes, and rescore them with full vectors when they have them.
+        """
+        queries = normalize_rows(queries)
+        n_rows = self.vectors.shape[0]
+        if rerank_factor is None:
+            rerank_factor = PQ_RERANK_FACTOR if self.meta_data.get("quantization") == "pq" else RERANK_FACTOR
+        candidates = COARSE_CANDIDATES if candidates is None else candidates
+        if self.coarse_vectors is not None and candidates > 0:
+            rows, scores = blocked_top_k(n_rows, matrix_scorer(self.coarse_vectors), self.project(queries),
+                                         max(candidates, top_k), row_mask, deadline=deadline)
+            rows = [r[np.isfinite(s)] for r, s in zip(rows, scores)]
+            return rerank(self.full_vectors, queries, rows, top_k)
+
+        if not self.meta_data.get("rerank") or rerank_factor <= 1:
+            return blocked_top_k(n_rows, self.score_block, queries, top_k, row_mask, deadline=deadline)
+        rows, scores = blocked_top_k(n_rows, self.score_block, queries, top_k * rerank_factor, row_mask,
+                                     deadline=deadline)
+        # Masked rows come back with -inf and must not be reranked into the results
+        rows = [r[np.isfinite(s)] for r, s in zip(rows, scores)]
+        return rerank(self.full_vectors, queries, rows, top_k)
+
+    def row_mask(self, id_mask):
+        """Boolean row mask from a boolean array or a collection of passage ids"""
+        mask = np.asarray(id_mask) if not isinstance(id_mask, (set, frozenset, dict)) else None
+        if mask is not None and mask.dtype == bool:
+            return mask
+        mask = np.zeros(len(self.passage_manager), dtype=bool)
+        for passage_id in id_mask:
+            try:
+                mask[self.passage_manager.row(passage_id)] = True
+            except KeyError:
+                continue
+        return mask
+
+    def search_batch(self, query_embeddings, top_k, id_mask=None, candidates=None):
+        """Search several query embeddings (Q, D) in one pass over the matrix"""
+        return self.backend_impl.search(query_embeddings, top_k, id_mask=id_mask, candidates=candidates)
+
+    def cleanup(self):
+        self.passage_manager.close()
+
+
+def open_searcher(index_path, shared_server=True):
+    """ExactSearcher for exact indexes, a memory-mapped LEANN searcher for everything else
+
+    shared_server: see MappedSearcher; exact indexes never need an embedding server
+    """
+    if is_exact_index(index_path):
+        return ExactSearcher(index_path)
+    return MappedSearcher(index_path, shared_server=shared_server)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Versioned index generations with an atomic CURRENT pointer
+Builders write into a fresh generation directory, validate it and only then
+swap the pointer, so searchers never open a half-written index
+
+Layout:
+    <root>/CURRENT                      name of the live generation
+    <root>/generations/gen-<timestamp>/ one complete index per build
+"""
+
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+POINTER_NAME = "CURRENT"
+GENERATIONS_DIR = "generations"
+
+
+def new_generation(root):
+    """Create and return an empty generation directory under root"""
+    generations = Path(root) / GENERATIONS_DIR
+    generations.mkdir(parents=True, exist_ok=True)
+    path = generations / datetime.now().strftime("gen-%Y%m%d-%H%M%S-%f")
+    path.mkdir()
+    return path
+
+
+def current_generation(root):
+    """Return the live generation directory, or None if nothing was published yet"""
+    pointer = Path(root) / POINTER_NAME
+    try:
+        name = pointer.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    path = Path(root) / GENERATIONS_DIR / name
+    return path if name and path.is_dir() else None
+
+
+def publish_generation(root, generation):
+    """Atomically point CURRENT at generation"""
+    root = Path(root)
+    tmp_pointer = root / f".{POINTER_NAME}.{os.getpid()}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(Path(generation).name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    # os.replace is atomic on POSIX and Windows: readers see the old or new name, never a partial one
+    os.replace(tmp_pointer, root / POINTER_NAME)
+
+
+def discard_generation(generation):
+    """Remove a generation whose build or validation failed"""
+    shutil.rmtree(generation, ignore_errors=True)
+
+
+def collect_garbage(root, keep=2):
+    """Delete generations older than the newest `keep` published ones
+
+    Generations newer than CURRENT are left alone, they may be builds in progress.
+    The previous generation is kept by default so searchers still holding it can finish.
+    """
+    current = current_generation(root)
+    if current is None:
+        return []
+
+    generations = sorted(p for p in (Path(root) / GENERATIONS_DIR).iterdir() if p.is_dir())
+    published = [p for p in generations if p.name <= current.name]
+    removed = []
+    for path in published[:-keep] if keep > 0 else published[:-1]:
+        # Open files (e.g. a chroma sqlite on Windows) can block deletion, retry next build
+        shutil.rmtree(path, ignore_errors=True)
+        if not path.exists():
+            removed.append(path)
+    return removed
+
+
+class GenerationWatcher:
+    """Keep one loaded index per process and reload it when CURRENT moves
+
+    load(index_path) builds the searcher, index_path being <generation>/<index_name>.
+    legacy_path is loaded when no generation has been published yet (indexes built
+    before generations existed). The replaced object's cleanup(), if it has one,
+    is called once its successor has loaded.
+    """
+
+    def __init__(self, root, load, index_name=None, legacy_path=None, on_switch=None):
+        self.root = Path(root)
+        self.load = load
+        self.index_name = index_name
+        self.legacy_path = legacy_path
+        self.on_switch = on_switch
+        self.generation = None
+        self.loaded = None
+
+    def index_path(self, generation=None):
+        """Path of the index inside generation (default: the live one)"""
+        if generation is None:
+            generation = current_generation(self.root)
+        if generation is None:
+            if self.legacy_path is None:
+                raise FileNotFoundError(f"No index published under {self.root}")
+            return str(self.legacy_path)
+        return str(generation / self.index_name) if self.index_name else str(generation)
+
+    def get(self):
+        generation = current_generation(self.root)
+        if self.loaded is None or generation != self.generation:
+            previous = self.loaded
+            switched = previous is not None
+            self.loaded = self.load(self.index_path(generation))
+            self.generation = generation
+            # Release the old generation's mmaps, file handles and embedding server
+            cleanup = getattr(previous, 'cleanup', None)
+            if cleanup:
+                cleanup()
+            if switched and self.on_switch:
+                self.on_switch(generation)
+        return self.loaded
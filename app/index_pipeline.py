@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Pipelined crawl -> embed -> index for Linux
+Runs linux_index_dump's crawler and the embedding model as concurrent stages
+connected by bounded queues, so the encoder works on the first batches while
+the crawl is still walking the tree. A full queue blocks the stage feeding it
+(backpressure), which keeps the unembedded backlog bounded. A third stage
+collects the embedded records; the index (and JSON dump) is written from them
+after the crawl, when hardlink/symlink aliases are complete.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+from leann import LeannBuilder
+from leann.api import compute_embeddings
+
+from embedding_store import item_identity, save_store
+from embedding_templates import get_template
+from index_generations import new_generation, publish_generation, discard_generation, collect_garbage
+from leann_index_builder import (
+    INDEX_ROOT, INDEX_NAME, KEEP_GENERATIONS, EMBED_BATCH_SIZE, EMBEDDING_TEMPLATE,
+    item_to_text, item_to_metadata, store_vectors, validate_index, write_index,
+)
+from linux_index_dump import resolve_search_paths, iter_metadata
+
+# Batches allowed to wait between two stages before the upstream stage blocks
+QUEUE_BATCHES = 4
+
+_DONE = object()  # end-of-stream marker passed down the pipeline
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up once another stage has failed"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    """Blocking get that gives up once another stage has failed"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class IndexPipeline:
+    """Crawler, embedder and collector threads for one pipelined build"""
+
+    def __init__(self, search_paths, max_items=None, dump_file=None):
+        self.search_paths = search_paths
+        self.max_items = max_items
+        self.dump_file = dump_file
+        self.template = get_template(EMBEDDING_TEMPLATE)
+
+        self.builder = LeannBuilder(backend_name="hnsw", is_recompute=False)
+        self.crawled = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.embedded = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.stop = threading.Event()
+        self.errors = []
+
+        self.items_crawled = 0
+        self.items_collected = 0
+        self.embeddings = []
+        self.identities = []
+        self.paths = []
+        self.texts = []
+        self.timings = {'crawl': 0.0, 'embed': 0.0, 'collect': 0.0}
+
+    def _stage(self, name, target):
+        """Wrap one stage in a thread that stops the others if it fails"""
+        def run():
+            try:
+                target()
+            except BaseException as e:
+                self.errors.append((name, e))
+                self.stop.set()
+        return threading.Thread(target=run, name=f"pipeline-{name}", daemon=True)
+
+    def crawl(self):
+        batch = []
+        start = time.time()
+        for item in iter_metadata(self.search_paths, self.max_items):
+            if self.stop.is_set():
+                return
+            batch.append(item)
+            self.items_crawled += 1
+            if len(batch) >= EMBED_BATCH_SIZE:
+                self.timings['crawl'] += time.time() - start
+                if not _put(self.crawled, batch, self.stop):
+                    return
+                start = time.time()
+                batch = []
+        self.timings['crawl'] += time.time() - start
+        if batch:
+            _put(self.crawled, batch, self.stop)
+        _put(self.crawled, _DONE, self.stop)
+
+    def embed(self):
+        while True:
+            batch = _get(self.crawled, self.stop)
+            if batch is _DONE:
+                _put(self.embedded, _DONE, self.stop)
+                return
+            start = time.time()
+            texts = [item_to_text(item, self.template) for item in batch]
+            embeddings = compute_embeddings(texts, self.builder.embedding_model, self.builder.embedding_mode, use_server=False)
+            self.timings['embed'] += time.time() - start
+            if not _put(self.embedded, (batch, texts, embeddings), self.stop):
+                return
+
+    def collect(self):
+        """Gather embedded batches; records go to the builder and dump once the crawl ends
+
+        The crawler adds hardlink/symlink "Aliases" to a record it has already
+        emitted whenever it meets another path to the same file, so a record is
+        only final after the whole tree was walked.
+        """
+        records = []
+        while True:
+            entry = _get(self.embedded, self.stop)
+            if entry is _DONE:
+                break
+            start = time.time()
+            batch, texts, embeddings = entry
+            records.extend(zip(batch, texts))
+            self.embeddings.append(embeddings)
+            self.items_collected += len(batch)
+            self.timings['collect'] += time.time() - start
+
+            sys.stdout.write(f"\rCrawled {self.items_crawled} | embedded {self.items_collected}")
+            sys.stdout.flush()
+        if self.stop.is_set():
+            return
+
+        start = time.time()
+        dump = open(self.dump_file, "w", encoding="utf-8") if self.dump_file else None
+        try:
+            if dump:
+                dump.write("[")
+            for count, (item, text) in enumerate(records):
+                self.builder.add_text(text, metadata=item_to_metadata(item))
+                self.identities.append(item_identity(item))
+                self.paths.append(item.get('Path'))
+                self.texts.append(text)
+                # Same JSON dump linux_index_dump.py writes, for later plain rebuilds
+                if dump:
+                    dump.write(",\n" if count else "\n")
+                    json.dump(item, dump, ensure_ascii=False)
+            if dump:
+                dump.write("\n]\n")
+        finally:
+            if dump:
+                dump.close()
+        self.timings['collect'] += time.time() - start
+
+    def run(self):
+        """Run all stages to completion and return the stacked embeddings"""
+        stages = [
+            self._stage('crawl', self.crawl),
+            self._stage('embed', self.embed),
+            self._stage('collect', self.collect),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self.errors:
+            name, error = self.errors[0]
+            raise RuntimeError(f"pipeline stage '{name}' failed: {error}") from error
+        return np.vstack(self.embeddings) if self.embeddings else None
+
+
+def run_pipeline(max_items=None, dump_file=None):
+    """Crawl, embed and publish a new LEANN generation in one overlapped pass"""
+    search_paths = resolve_search_paths()
+    if not search_paths:
+        print("No valid search paths found!")
+        return
+
+    print(f"\nRunning crawl -> embed -> index pipeline (up to {max_items} items)...")
+    start = time.time()
+    pipeline = IndexPipeline(search_paths, max_items=max_items, dump_file=dump_file)
+    embeddings = pipeline.run()
+    if embeddings is None:
+        print("\nNo files found, nothing to index")
+        return
+    pipeline_time = time.time() - start
+
+    total_items = pipeline.items_collected
+    print("\n\nBuilding index...")
+    generation = new_generation(INDEX_ROOT)
+    index_path = str(generation / INDEX_NAME)
+    try:
+        ids = [str(i) for i in range(total_items)]
+        # Embed busy time includes loading the model; only a fair rate over several batches
+        seconds_per_passage = None
+        if total_items >= 2 * EMBED_BATCH_SIZE:
+            seconds_per_passage = pipeline.timings['embed'] / total_items
+        mode = write_index(pipeline.builder, index_path, ids, embeddings, seconds_per_passage)
+        # Lets the next leann_index_builder.py run reuse these embeddings
+        save_store(index_path, ids, pipeline.identities, pipeline.paths, pipeline.texts,
+                   store_vectors(mode, embeddings),
+                   template=pipeline.template.key, embedding_model=pipeline.builder.embedding_model,
+                   embedding_mode=pipeline.builder.embedding_mode)
+        print("Validating index...")
+        validate_index(index_path, total_items, pipeline.texts[-1])
+    except BaseException:
+        discard_generation(generation)
+        raise
+
+    publish_generation(INDEX_ROOT, generation)
+    total_time = time.time() - start
+    print(f"✓ Index saved to {index_path} (now live)")
+
+    for old in collect_garbage(INDEX_ROOT, keep=KEEP_GENERATIONS):
+        print(f"  removed old generation {old.name}")
+
+    timings = pipeline.timings
+    print(f"\nItems: {total_items}")
+    print(f"Crawl busy: {timings['crawl']:.2f}s | embed busy: {timings['embed']:.2f}s | collect busy: {timings['collect']:.2f}s")
+    print(f"Pipeline wall time: {pipeline_time:.2f}s (sequential would be ~{sum(timings.values()):.2f}s)")
+    print(f"Total incl. graph build: {total_time:.2f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        try:
+            max_items_arg = int(sys.argv[1])
+        except ValueError:
+            print("Usage: python index_pipeline.py [number_of_items] [dump_file.json]")
+            sys.exit(1)
+    else:
+        max_items_arg = None
+
+    dump_file_arg = sys.argv[2] if len(sys.argv) > 2 else None
+    run_pipeline(max_items=max_items_arg, dump_file=dump_file_arg)
@@ -1,12 +1,92 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from leann import LeannSearcher
 import sys
 import re
 from datetime import datetime, timedelta
 
+from exact_index import open_searcher
+from index_generations import GenerationWatcher
+from leann_query import embed_query, search_by_embedding
+from query_cache import QueryEmbeddingCache, SemanticQueryCache
+from query_deadline import Deadline, DeadlineExceeded, DeadlineStats, SearchResults
+from query_encoder import encoder_for_index
+from query_planner import Constraint, FilterIndex, execute_plan, extract_constraints, plan_search
+
+# leann_index_builder.py publishes each build as a generation under INDEX_ROOT;
+# INDEX_PATH is the pre-generation layout, still used when nothing was published
+INDEX_ROOT = Path("./").resolve() / "leann_index"
+INDEX_NAME = "demo.leann"
 INDEX_PATH = str(Path("./").resolve() / "demo.leann")
 
+# Repeated cleaned query text skips the encoder entirely
+EMBEDDING_CACHE_SIZE = 1024
+EMBEDDING_CACHE = QueryEmbeddingCache(max_entries=EMBEDDING_CACHE_SIZE)
+
+# CPU-optimized query encoder (query_encoder.py): None keeps LEANN's encoder,
+# "torch-int8" quantizes the model on load, "onnx" runs QUERY_ENCODER_ONNX_FILE from
+# QUERY_ENCODER_PATH (a local copy of the index's model, see query_encoder.py export).
+# Falls back to LEANN's encoder if it drifts from the index's embeddings.
+QUERY_ENCODER = None
+QUERY_ENCODER_PATH = None
+QUERY_ENCODER_ONNX_FILE = "onnx/model.onnx"
+# "torch-int8" applies QUERY_ENCODER_THREADS with torch.set_num_threads, which is
+# process-wide: LEANN's own encoder (and anything else using torch here) gets it too.
+# "onnx" sets it on its own session only.
+QUERY_ENCODER_THREADS = 4
+
+# Paraphrased queries ("images", "image files") reuse a recent candidate list
+# when their embeddings are at least this cosine-similar
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_CACHE_VERIFY_RATE = 0.1  # fraction of hits re-checked against the exact search
+
+# One cache per index path: candidates are passages of the index they came from
+SEMANTIC_CACHES = {}
+
+def semantic_cache_for(searcher):
+    """The SemanticQueryCache of the searcher's index, created on first use"""
+    key = getattr(searcher, 'index_path', None) or id(searcher)
+    if key not in SEMANTIC_CACHES:
+        SEMANTIC_CACHES[key] = SemanticQueryCache(
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            max_entries=SEMANTIC_CACHE_SIZE,
+            verify_rate=SEMANTIC_CACHE_VERIFY_RATE,
+        )
+    return SEMANTIC_CACHES[key]
+
+# Per-request time budget in milliseconds (None: no deadline). Stages that overrun
+# it are abandoned and search_files returns the results found so far, marked partial.
+# Interactive callers pass their own, e.g. search_files(query, deadline_ms=150).
+SEARCH_DEADLINE_MS = None
+DEADLINE_STATS = DeadlineStats()
+
+# Filter columns and statistics (query_planner.py) per index path, None for
+# indexes built before they existed
+FILTER_INDEXES = {}
+
+def on_switch(generation):
+    SEMANTIC_CACHES.clear()
+    FILTER_INDEXES.clear()
+
+# Loaded searcher for this process, swapped automatically after a rebuild.
+# Cached candidates refer to the old generation's passages, so drop them on switch.
+CURRENT_INDEX = GenerationWatcher(
+    INDEX_ROOT,
+    load=open_searcher,  # MappedSearcher, or ExactSearcher for INDEX_BACKEND = "exact" builds
+    index_name=INDEX_NAME,
+    legacy_path=INDEX_PATH,
+    on_switch=on_switch,
+)
+
+def filter_index(searcher):
+    """The searcher's FilterIndex, loaded once per index path"""
+    index_path = getattr(searcher, 'index_path', None)
+    if index_path is None:
+        return None
+    if index_path not in FILTER_INDEXES:
+        FILTER_INDEXES[index_path] = FilterIndex.load(index_path)
+    return FILTER_INDEXES[index_path]
+
 class TimeParser:
     def __init__(self):
         # Main pattern: captures optional fuzzy modifier, number, unit, and optional "ago"
@@ -75,8 +155,15 @@ class TimeParser:
         
         return (start, end)
 
-def search_files(query, top_k=15):
-    """Search the index and return results"""
+def find_files(query, top_k, searcher, deadline, semantic_cache=None):
+    """Search one loaded index without printing
+
+    Returns (SearchResults, time_matches, plan), or None when the query is only
+    time or folder expressions. semantic_cache must belong to this searcher's index
+    (default: the one semantic_cache_for() keeps for it).
+    """
+    if semantic_cache is None:
+        semantic_cache = semantic_cache_for(searcher)
     # Parse time expressions
     parser = TimeParser()
     time_matches = parser.parse(query)
@@ -87,41 +174,85 @@ def search_files(query, top_k=15):
         for match in time_matches:
             clean_query = clean_query.replace(match['full_match'], '').strip()
     
-    # Check if clean_query is too short (meaning it was mostly/only time expressions)
+    # File type and folder constraints need the path metadata and filter columns of newer builds
+    filters = filter_index(searcher)
+    clean_query, constraints = extract_constraints(clean_query, filters.known_folders if filters else None)
+    if filters is None:
+        constraints = []
+    if time_matches:
+        constraints.insert(0, Constraint("time", time_matches[0]['range'], time_matches[0]['full_match']))
+
+    # Check if clean_query is too short (meaning it was mostly/only time or folder expressions)
     if len(clean_query) < 4:
+        return None
+    
+    def encode():
+        encoder = None
+        if QUERY_ENCODER:
+            encoder = encoder_for_index(searcher, QUERY_ENCODER, QUERY_ENCODER_PATH,
+                                        QUERY_ENCODER_THREADS, QUERY_ENCODER_ONNX_FILE)
+        return embed_query(searcher, clean_query, cache=EMBEDDING_CACHE, encoder=encoder)
+
+    plan = None
+    results = []
+    try:
+        deadline.check("open")
+        query_embedding = deadline.run("encode", encode)
+
+        # Near-identical query seen recently: reuse its unfiltered candidate list.
+        # A filtered query takes the whole list and applies its own constraints to it.
+        cached, _ = semantic_cache.lookup(query_embedding, None if constraints else top_k)
+        if constraints:
+            # Filtered: the planner picks post-filtering, a masked scan or brute force over the matches
+            plan = plan_search(searcher, filters, constraints, top_k)
+            results = execute_plan(plan, searcher, filters, query_embedding, top_k,
+                                   lambda s, embedding, k: search_by_embedding(s, embedding, top_k=k,
+                                                                               deadline=deadline),
+                                   deadline=deadline, candidates=cached)
+            # Post-filtering fetched an unfiltered list the next paraphrase can filter again
+            if plan.candidates is not None and not deadline.partial:
+                semantic_cache.store(query_embedding, plan.fetch, plan.candidates)
+        else:
+            results = cached
+            if results is None:
+                results = search_by_embedding(searcher, query_embedding, top_k=top_k, deadline=deadline)
+                # A scan cut short isn't the query's real candidate list
+                if not deadline.partial:
+                    semantic_cache.store(query_embedding, top_k, results)
+            elif deadline.budget_ms is None and semantic_cache.should_verify():
+                # Verification is extra work, never done on a deadline
+                exact = search_by_embedding(searcher, query_embedding, top_k=top_k)
+                semantic_cache.record_drift(results, exact)
+    except DeadlineExceeded:
+        # Nothing usable from the stage that overran; whatever came before is kept
+        pass
+    results = SearchResults(results, deadline)
+    DEADLINE_STATS.record(deadline)
+    return results, time_matches, plan
+
+def search_files(query, top_k=15, searcher=None, deadline_ms=SEARCH_DEADLINE_MS):
+    """Search the index and return results (SearchResults, .partial when the deadline cut them short)"""
+    deadline = Deadline(deadline_ms)
+    # Long-running callers may pass their own searcher; otherwise follow the live generation
+    if searcher is None:
+        searcher = CURRENT_INDEX.get()
+
+    found = find_files(query, top_k, searcher, deadline)
+    if found is None:
         print("Error: add more input for accurate results.")
         return
-    
-    # Single query to vector DB
-    searcher = LeannSearcher(INDEX_PATH)
-    results = searcher.search(clean_query, top_k=top_k, recompute_embeddings=False)
-    
-    # Filter by time if time expression found
-    if time_matches:
-        time_range = time_matches[0]['range']  # Use first time expression
-        start_time, end_time = time_range
-        
-        filtered_results = []
-        for result in results:
-            # Access metadata attribute directly (not .get())
-            metadata = result.metadata if hasattr(result, 'metadata') else {}
-            
-            if metadata:
-                # Check modification date first, fall back to creation date
-                date_str = metadata.get('modification_date') or metadata.get('creation_date')
-                
-                if date_str:
-                    # Compare dates
-                    if start_time <= date_str <= end_time:
-                        filtered_results.append(result)
-        
-        results = filtered_results
+    results, time_matches, plan = found
     
     # Print results
     print(f"\nSearch results for: '{query}'")
     if time_matches:
         print(f"Time filter: {time_matches[0]['number']} {time_matches[0]['unit']}(s) {'(fuzzy)' if time_matches[0]['fuzzy'] else ''}")
         print(f"Date range: {time_matches[0]['range'][0][:10]} to {time_matches[0]['range'][1][:10]}")
+    if plan:
+        print(plan.report())
+    if results.partial:
+        print(f"Partial results: {deadline_ms} ms deadline reached during {results.stage} "
+              f"({results.elapsed_ms:.0f} ms)")
     print("-" * 80)
     
     for i, result in enumerate(results, 1):
@@ -137,6 +268,8 @@ def search_files(query, top_k=15):
                 print(f"Modified: {metadata['modification_date']}")
         print("-" * 80)
 
+    return results
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python search_index.py \"<search query>\" [top_k]")
@@ -2,45 +2,291 @@
 import json
 from pathlib import Path
 from leann import LeannBuilder
+from leann.api import compute_embeddings
+import numpy as np
 import sys
+import time
 
-def process_json_items(json_file_path):
+from build_checkpoint import EmbeddingCheckpoint, build_key
+from embedding_store import EmbeddingStore, item_identity, save_store
+from embedding_templates import get_template
+from exact_index import build_exact_index, open_searcher
+from index_generations import new_generation, current_generation, publish_generation, discard_generation, collect_garbage
+from leann_query import embed_query, search_by_embedding
+from mapped_index import write_passage_offsets
+from query_planner import write_filter_columns
+from storage_mode import (
+    CALIBRATION_SAMPLE, apply_mode, calibrate, choose_mode, estimate_modes, passage_bytes, sidecar_bytes,
+)
+
+# Every build goes into a new generation under INDEX_ROOT; searchers follow INDEX_ROOT/CURRENT
+INDEX_ROOT = Path("./").resolve() / "leann_index"
+INDEX_NAME = "demo.leann"
+KEEP_GENERATIONS = 2  # live generation + the previous one for searchers still holding it
+
+# Embeddings are computed and saved to disk in batches, so an interrupted build resumes
+CHECKPOINT_ROOT = INDEX_ROOT / "checkpoints"
+EMBED_BATCH_SIZE = 1000
+
+# "hnsw" builds a LEANN graph index; "exact" writes a NumPy brute-force index
+# (exact_index.py) that builds instantly and is as fast up to ~100k files.
+# EXACT_DTYPE "float16" halves the exact index's vectors.
+# EXACT_QUANTIZATION "int8" (4x smaller) or "pq" (16x smaller) scans compact codes instead.
+# "pq" alone is approximate (recall@10 around 0.4-0.5); int8 alone is around 0.96.
+# EXACT_RERANK keeps the full vectors on disk to rerank the best candidates exactly
+# (recall close to 1.0 for both). The codes are then stored in addition to the full
+# vectors, so the index gets slightly larger on disk, not smaller; only the memory
+# touched per query shrinks. Set EXACT_RERANK = False when disk size is the goal.
+# EXACT_COARSE_DIMS adds a low-dimensional first pass (PCA, or "truncate" for models
+# trained for it) whose candidates are rescored at full dimension.
+INDEX_BACKEND = "hnsw"
+EXACT_DTYPE = "float32"
+EXACT_QUANTIZATION = None
+EXACT_RERANK = True
+EXACT_COARSE_DIMS = None
+EXACT_COARSE_METHOD = "pca"
+
+# HNSW embedding storage: "stored" keeps every vector (fast search), "recompute" keeps
+# only the graph and re-embeds at query time (~97% smaller), "auto" picks the fastest
+# mode whose estimated index size fits STORAGE_BUDGET_MB (None: no limit, so stored)
+EMBEDDING_STORAGE = "auto"
+STORAGE_BUDGET_MB = None
+LATENCY_TARGET_MS = 1000
+
+# Text each file is embedded as, see embedding_templates.py ("sentence", "compact", ...);
+# can be overridden per build on the command line
+EMBEDDING_TEMPLATE = "sentence"
+
+def validate_index(index_path, expected_items, sample_text):
+    """Open a freshly built index and make sure it is complete and searchable"""
+    searcher = open_searcher(index_path)
+    try:
+        passage_count = len(searcher.passage_manager)
+        if passage_count != expected_items:
+            raise RuntimeError(f"index has {passage_count} passages, expected {expected_items}")
+        results = search_by_embedding(searcher, embed_query(searcher, sample_text), top_k=1)
+        if not results:
+            raise RuntimeError("sample query returned no results")
+    finally:
+        searcher.cleanup()
+
+def select_storage_mode(builder, embeddings, seconds_per_passage=None):
+    """Set the builder's recompute mode from EMBEDDING_STORAGE, estimating both modes for "auto"
+
+    seconds_per_passage: measured embedding speed of this build, if it embedded enough
+    items; otherwise the model is calibrated on a sample of the passages.
+    """
+    mode = EMBEDDING_STORAGE
+    if mode == "auto" and STORAGE_BUDGET_MB is None:
+        mode = "stored"  # No budget: nothing to trade speed for, skip calibrating
+    if mode != "auto":
+        apply_mode(builder, mode)
+        return mode
+
+    texts = [chunk["text"] for chunk in builder.chunks[:CALIBRATION_SAMPLE]]
+    per_passage, per_query = calibrate(texts, builder.embedding_model, builder.embedding_mode,
+                                       getattr(builder, 'embedding_options', None))
+    if seconds_per_passage is not None:
+        per_passage = seconds_per_passage
+    estimates = estimate_modes(len(embeddings), embeddings.shape[1], passage_bytes(builder.chunks),
+                               per_passage, per_query, sidecar_bytes(builder.chunks))
+    budget = STORAGE_BUDGET_MB * 1024 * 1024 if STORAGE_BUDGET_MB is not None else None
+    mode, reason = choose_mode(estimates, budget, LATENCY_TARGET_MS)
+    for name, estimate in estimates.items():
+        print(f"  {name}: ~{estimate['bytes'] / 1024 / 1024:.1f} MB, ~{estimate['latency_ms']:.0f} ms per query")
+    print(f"Embedding storage: {mode} ({reason})")
+    apply_mode(builder, mode)
+    return mode
+
+def write_index(builder, index_path, ids, embeddings, seconds_per_passage=None):
+    """Write the INDEX_BACKEND index for the builder's passages and their embeddings
+
+    Returns the storage mode: "exact", or the "stored"/"recompute" mode of an HNSW build.
+    """
+    mode = "exact"
+    if INDEX_BACKEND == "exact":
+        build_exact_index(index_path, ids, embeddings, builder.chunks,
+                          builder.embedding_model, builder.embedding_mode,
+                          getattr(builder, 'embedding_options', None), dtype=EXACT_DTYPE,
+                          quantization=EXACT_QUANTIZATION, keep_full=EXACT_RERANK,
+                          coarse_dims=EXACT_COARSE_DIMS, coarse_method=EXACT_COARSE_METHOD)
+    else:
+        mode = select_storage_mode(builder, embeddings, seconds_per_passage)
+        builder.build_index_from_arrays(index_path, ids, embeddings)
+        # Lets the search script open the index without unpickling every passage offset
+        write_passage_offsets(index_path)
+    # Columns and statistics the query planner estimates and applies filters with
+    write_filter_columns(index_path, ids, builder.chunks)
+    return mode
+
+def store_vectors(mode, embeddings):
+    """Vectors save_store keeps for reuse: none for recompute builds, which exist to not store them"""
+    return None if mode == "recompute" else embeddings
+
+def item_to_text(item, template=None):
+    """Create embedding text for one metadata item (EMBEDDING_TEMPLATE unless given)"""
+    return (template or get_template(EMBEDDING_TEMPLATE)).render(item)
+
+def item_to_metadata(item):
+    """Prepare metadata with dates and path for one metadata item"""
+    metadata = {}
+    if 'Path' in item:
+        metadata['path'] = item['Path']
+    if item.get('Aliases'):
+        metadata['aliases'] = item['Aliases']
+    if 'CreationDate' in item:
+        metadata['creation_date'] = item['CreationDate']
+    if 'ContentChangeDate' in item:
+        metadata['modification_date'] = item['ContentChangeDate']
+    return metadata
+
+def embed_with_checkpoints(builder, texts):
+    """Embed texts in batches, saving each batch so a restarted build resumes
+
+    Returns (checkpoint, seconds per item), the rate measured after the first batch
+    (which includes loading the model), or None if this run embedded a single batch.
+    """
+    total_items = len(texts)
+    key = build_key(texts, builder.embedding_model, builder.embedding_mode, EMBED_BATCH_SIZE)
+    checkpoint = EmbeddingCheckpoint(CHECKPOINT_ROOT, key)
+
+    done = checkpoint.items_done
+    if done:
+        print(f"Resuming from checkpoint: {done}/{total_items} items already embedded")
+
+    timed_from = timed_start = None
+    for start in range(done, total_items, EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        embeddings = compute_embeddings(batch, builder.embedding_model, builder.embedding_mode, use_server=False)
+        checkpoint.save_batch(embeddings)
+        if timed_from is None:
+            timed_from, timed_start = start + len(batch), time.time()
+
+        # Show progress
+        embedded = start + len(batch)
+        progress = embedded / total_items * 100
+        sys.stdout.write(f"\rEmbedding: {embedded}/{total_items} ({progress:.1f}%)")
+        sys.stdout.flush()
+
+    seconds_per_item = None
+    if timed_from is not None and total_items > timed_from:
+        seconds_per_item = (time.time() - timed_start) / (total_items - timed_from)
+    return checkpoint, seconds_per_item
+
+def plan_reuse(items, texts, store, reuse_vectors=True):
+    """Decide which previous passage id and vector each item keeps
+
+    Returns (ids, reuse_rows, moved): reuse_rows[i] is the store row whose vector
+    item i reuses, or None if it has to be embedded. reuse_vectors=False keeps
+    only ids (the store's vectors came from another model).
+    """
+    ids = []
+    reuse_rows = []
+    moved = 0
+    next_id = store.next_id() if store else 0
+    claimed = set()
+
+    for item, text in zip(items, texts):
+        row, reuse_vector, is_move = (None, False, False)
+        if store:
+            row, reuse_vector, is_move = store.match(item_identity(item), item.get('Path'), text)
+
+        # Hardlinks share an identity; only the first one inherits the old id
+        if row is not None and row not in claimed:
+            claimed.add(row)
+            ids.append(store.ids[row])
+            reuse_rows.append(row if reuse_vector and reuse_vectors else None)
+            moved += is_move
+        else:
+            ids.append(str(next_id))
+            reuse_rows.append(None)
+            next_id += 1
+
+    return ids, reuse_rows, moved
+
+def process_json_items(json_file_path, template_name=None):
     """Load and process JSON file with metadata items"""
     with open(json_file_path, 'r', encoding='utf-8') as f:
         items = json.load(f)
+    template = get_template(template_name or EMBEDDING_TEMPLATE)
+    print(f"Embedding template: {template.key}")
     
-    INDEX_PATH = str(Path("./").resolve() / "demo.leann")
     builder = LeannBuilder(backend_name="hnsw", is_recompute=False)
     
     total_items = len(items)
     print(f"Processing {total_items} items...")
+    if not total_items:
+        print("Error: no items to index")
+        return
     
-    for idx, item in enumerate(items):
-        # Create embedding text sentence
-        embedding_text = f"{item.get('Name', 'unknown')} located at {item.get('Path', 'unknown')} and size {item.get('Size', 'unknown')} bytes with content type {item.get('ContentType', 'unknown')} and kind {item.get('Kind', 'unknown')}"
-        
-        # Prepare metadata with dates
-        metadata = {}
-        if 'CreationDate' in item:
-            metadata['creation_date'] = item['CreationDate']
-        if 'ContentChangeDate' in item:
-            metadata['modification_date'] = item['ContentChangeDate']
-        
-        # Add to builder
-        builder.add_text(embedding_text, metadata=metadata)
-        
-        # Show progress
-        progress = (idx + 1) / total_items * 100
-        sys.stdout.write(f"\rProgress: {idx + 1}/{total_items} ({progress:.1f}%)")
-        sys.stdout.flush()
+    texts = []
+    for item in items:
+        embedding_text = item_to_text(item, template)
+        builder.add_text(embedding_text, metadata=item_to_metadata(item))
+        texts.append(embedding_text)
+    
+    # Unchanged and moved files keep their ids (and vectors, if their text is unchanged)
+    live = current_generation(INDEX_ROOT)
+    store = EmbeddingStore.load(str(live / INDEX_NAME)) if live else None
+    if store and store.template and store.template != template.key:
+        print(f"Live index was embedded with template {store.template}; items whose text changed are re-embedded")
+    reuse_vectors = bool(store) and store.same_model(builder.embedding_model, builder.embedding_mode)
+    if store and store.vectors is None:
+        # Recompute-mode generations keep no vectors to reuse, only ids
+        reuse_vectors = False
+        print("Live index was built in recompute mode without stored vectors; every item is re-embedded")
+    elif store and not reuse_vectors:
+        print(f"Live index was embedded with {store.embedding_model or 'an unrecorded model'} "
+              f"({store.embedding_mode or 'unknown mode'}); every item is re-embedded")
+    ids, reuse_rows, moved = plan_reuse(items, texts, store, reuse_vectors)
+    to_embed = [i for i, row in enumerate(reuse_rows) if row is None]
+    print(f"Reusing {total_items - len(to_embed)} embeddings from the live index "
+          f"({moved} moved/renamed files kept their ids), embedding {len(to_embed)} items")
     
-    print("\n\nBuilding index...")
-    builder.build_index(INDEX_PATH)
-    print(f"✓ Index saved to {INDEX_PATH}")
+    checkpoint = None
+    seconds_per_passage = None
+    if to_embed:
+        checkpoint, seconds_per_passage = embed_with_checkpoints(builder, [texts[i] for i in to_embed])
+    
+    print(f"\n\nBuilding {INDEX_BACKEND} index...")
+    generation = new_generation(INDEX_ROOT)
+    INDEX_PATH = str(generation / INDEX_NAME)
+    try:
+        new_vectors = checkpoint.load_embeddings() if checkpoint else None
+        dimensions = new_vectors.shape[1] if new_vectors is not None else store.vectors.shape[1]
+        embeddings = np.empty((total_items, dimensions), dtype=np.float32)
+        if new_vectors is not None:
+            embeddings[to_embed] = new_vectors
+        reused = [i for i, row in enumerate(reuse_rows) if row is not None]
+        if reused:
+            embeddings[reused] = store.vectors[[reuse_rows[i] for i in reused]]
+
+        # Reuse saves the embedding work only: the graph, passages and filter columns
+        # are always rebuilt, for moved/renamed files too
+        mode = write_index(builder, INDEX_PATH, ids, embeddings, seconds_per_passage)
+        save_store(INDEX_PATH, ids, [item_identity(item) for item in items],
+                   [item.get('Path') for item in items], texts, store_vectors(mode, embeddings),
+                   template=template.key,
+                   embedding_model=builder.embedding_model, embedding_mode=builder.embedding_mode)
+        print("Validating index...")
+        validate_index(INDEX_PATH, total_items, texts[-1])
+    except BaseException:
+        # The live generation is untouched; searchers never see this build.
+        # The embedding checkpoint is kept, so a rerun goes straight to this step.
+        discard_generation(generation)
+        raise
+
+    publish_generation(INDEX_ROOT, generation)
+    if checkpoint:
+        checkpoint.clear()
+    print(f"✓ Index saved to {INDEX_PATH} (now live)")
+
+    for old in collect_garbage(INDEX_ROOT, keep=KEEP_GENERATIONS):
+        print(f"  removed old generation {old.name}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python build_index.py <json_file>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python leann_index_builder.py <json_file> [template]")
         sys.exit(1)
     
     json_file = sys.argv[1]
@@ -48,4 +294,4 @@ if __name__ == "__main__":
         print(f"Error: File {json_file} not found")
         sys.exit(1)
     
-    process_json_items(json_file)
\ No newline at end of file
+    process_json_items(json_file, sys.argv[2] if len(sys.argv) == 3 else None)
\ No newline at end of file
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+LEANN query helpers shared by the search script and benchmarks
+Splits LeannSearcher.search() into its two stages (query encode, graph search)
+so callers can cache or skip either one
+"""
+
+import threading
+
+from leann.api import SearchResult
+
+from storage_mode import needs_recompute
+
+# Embedding server port recompute-mode indexes ask LEANN for (it moves on if taken)
+RECOMPUTE_PORT = 5557
+# A server start abandoned at a deadline keeps running; the next caller waits for it
+_server_lock = threading.Lock()
+
+
+def query_template(searcher):
+    """Return the query prompt template stored with the index, if any"""
+    options = getattr(searcher, 'embedding_options', None) or {}
+    return options.get('query_prompt_template') or options.get('prompt_template')
+
+
+def model_id(searcher, encoder=None):
+    """Identify the query encoder so cached embeddings never cross models"""
+    return (
+        getattr(searcher, 'embedding_mode', 'sentence-transformers'),
+        searcher.embedding_model,
+        query_template(searcher),
+        encoder.name if encoder is not None else None,
+    )
+
+
+def embed_query(searcher, text, cache=None, encoder=None):
+    """Encode cleaned query text with the index's own embedding model, shape (1, D)
+
+    encoder: optional query_encoder.QueryEncoder used instead of LEANN's encoder
+    """
+    key = model_id(searcher, encoder)
+    if cache is not None:
+        embedding = cache.get(key, text)
+        if embedding is not None:
+            return embedding
+
+    if encoder is not None:
+        embedding = encoder.encode([f"{query_template(searcher) or ''}{text}"])
+    else:
+        embedding = searcher.backend_impl.compute_query_embedding(
+            text,
+            use_server_if_available=False,
+            query_template=query_template(searcher),
+        )
+    if cache is not None:
+        cache.put(key, text, embedding)
+    return embedding
+
+
+def recompute_port(searcher):
+    """Start (or reuse) the embedding server a recompute-mode index searches through"""
+    meta_path = getattr(searcher, 'meta_path_str', None) or f"{searcher.index_path}.meta.json"
+    with _server_lock:
+        return searcher.backend_impl._ensure_server_running(meta_path, port=RECOMPUTE_PORT)
+
+
+def search_by_embedding(searcher, query_embedding, top_k=15, complexity=64, deadline=None):
+    """Run the backend graph search for a precomputed query embedding
+
+    Whether embeddings are recomputed follows the index's own meta data.
+    deadline: optional query_deadline.Deadline. The exact backend stops its scan
+    at it and returns what it found; starting the embedding server and a graph
+    search can't be stopped, so they run on a worker thread and raise
+    DeadlineExceeded when they overrun.
+    """
+    top_k = min(top_k, len(searcher.passage_manager))
+    recompute = needs_recompute(searcher.meta_data)
+    zmq_port = None
+    if recompute:
+        # The first search of a recompute index starts the server, which can take seconds
+        if deadline is None:
+            zmq_port = recompute_port(searcher)
+        else:
+            zmq_port = deadline.run("embedding-server", recompute_port, searcher)
+    kwargs = {
+        'complexity': complexity,
+        'recompute_embeddings': recompute,
+        'zmq_port': zmq_port,
+    }
+    if deadline is None:
+        raw = searcher.backend_impl.search(query_embedding, top_k, **kwargs)
+    elif searcher.meta_data.get('backend_name') == 'exact':
+        deadline.check("search")
+        raw = searcher.backend_impl.search(query_embedding, top_k, deadline=deadline, **kwargs)
+    else:
+        raw = deadline.run("search", searcher.backend_impl.search, query_embedding, top_k, **kwargs)
+
+    results = []
+    for passage_id, distance in zip(raw['labels'][0], raw['distances'][0]):
+        try:
+            passage = searcher.passage_manager.get_passage(passage_id)
+        except KeyError:
+            continue
+        results.append(SearchResult(
+            id=passage_id,
+            score=float(distance),
+            text=passage['text'],
+            metadata=passage.get('metadata', {}),
+        ))
+    return results
@@ -7,9 +7,17 @@ Output is optimized for vector database storage with minimal fields
 
 import os
 import json
-import mimetypes
-from datetime import datetime
+import stat as stat_module
 import sys
+from contextlib import nullcontext
+from datetime import datetime
+
+from crawler import (
+    IgnoreRules, CrawlStats, CrawlProgress, CrawlCheckpoint, DirectoryCache, IOThrottle, NewestFiles,
+    walk_files, file_fingerprint, set_idle_priority,
+)
+from file_records import file_type, iso_timestamp
+from archive_members import ARCHIVE_SEPARATOR, is_archive, list_members
 
 # EDIT THIS LIST: Add or remove folders to search
 SEARCH_FOLDERS = [
@@ -23,30 +31,144 @@ SEARCH_FOLDERS = [
     # "Code/Projects",  # Subfolder example
 ]
 
-def get_metadata(file_path):
-    """Extract essential metadata for a given file"""
+# EDIT THIS LIST: gitignore-style patterns skipped during the crawl.
+# Matching directories are pruned before they are listed; "!pattern" re-includes.
+# Patterns containing a "/" are relative to each search folder ("Code/build/").
+IGNORE_PATTERNS = [
+    ".git/",
+    ".hg/",
+    ".svn/",
+    "node_modules/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    ".tox/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    ".cache/",
+    "*.pyc",
+    # "build/",  # Uncomment to skip build output everywhere
+]
+
+# Per-directory ignore files, applied to the directory they live in (like .gitignore)
+IGNORE_FILE_NAMES = [".monkeignore", ".gitignore"]
+
+# Directory listings and records from the last crawl; directories whose mtime
+# is unchanged are not re-listed on the next run. Set to None to always walk fully.
+CRAWL_CACHE_FILE = "linux_crawl_cache.pickle"
+
+# Crawl boundaries and deduplication:
+# FOLLOW_SYMLINKS descends into symlinked folders (loop-safe, each real folder is walked once)
+# ONE_FILESYSTEM stays on the device of each search folder (skips mounted drives/shares)
+# DEDUPE_FILES emits hardlinked / symlinked copies of a file once, with the other paths as "Aliases"
+FOLLOW_SYMLINKS = False
+ONE_FILESYSTEM = False
+DEDUPE_FILES = True
+
+# Background crawling on shared hosts: cap filesystem operations per second
+# (None = unlimited), back off when single operations get SLOW_IO_FACTOR times
+# slower than their usual latency, and optionally drop to idle CPU/I/O priority.
+# SLOW_IO_BACKOFF None enables the backoff only when a cap is set.
+MAX_STATS_PER_SEC = None
+MAX_DIRS_PER_SEC = None
+SLOW_IO_BACKOFF = None
+SLOW_IO_FACTOR = 4.0
+IDLE_PRIORITY = False
+
+# Recency-first crawl: visit the most recently modified directories first, and
+# with a max_items cap keep the N most recently modified files instead of the
+# first N found. SCAN_BUDGET stops after that many files have been looked at
+# (None = whole tree), trading completeness of the "newest N" for crawl time.
+CRAWL_NEWEST_FIRST = False
+SCAN_BUDGET = None
+
+# List the files inside zip/tar archives (without extracting them) and index
+# each one as "archive.zip!/inner/path" next to the archive itself
+INDEX_ARCHIVES = False
+
+# Long crawls save a checkpoint (pending folders + records so far) every
+# CHECKPOINT_INTERVAL seconds; rerunning after a crash or Ctrl-C resumes from it.
+# Set to None to disable.
+CRAWL_CHECKPOINT = "linux_crawl_checkpoint"
+CHECKPOINT_INTERVAL = 30
+
+# Record (device, inode) and a first/last-block content fingerprint per file so
+# the index builder can recognise moved/renamed files and keep their embeddings.
+# The fingerprint reads up to 8 KB of every new or changed file (every file when
+# CRAWL_CACHE_FILE is None or on the first crawl), which costs a disk seek per
+# file on spinning disks and network shares. Unmoved files keep their embeddings
+# either way (they are matched by their embedding text).
+RECORD_FILE_IDENTITY = False
+
+def get_metadata(file_path, stat=None, identity=True):
+    """Extract essential metadata for a given file
+
+    identity=False skips Device/Inode/Fingerprint, e.g. for stat-like objects
+    built from a file list that carry no inode and shouldn't trigger a file read.
+    """
     try:
-        stat = os.stat(file_path)
+        if stat is None:
+            stat = os.stat(file_path)
 
-        # Guess MIME type
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if mime_type is None:
-            mime_type = "unknown"
+        # MIME type and kind are resolved once per extension
+        name = file_path.rpartition("/")[2]
+        _, mime_type, kind = file_type(name)
 
-        return {
+        meta = {
             "Path": file_path,
-            "Name": os.path.basename(file_path),
+            "Name": name,
             "Size": stat.st_size,
             "ContentType": mime_type,
-            "Kind": mime_type.split("/")[-1] if "/" in mime_type else mime_type,
-            "CreationDate": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "ContentChangeDate": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "Kind": kind,
+            "CreationDate": iso_timestamp(stat.st_ctime),
+            "ContentChangeDate": iso_timestamp(stat.st_mtime),
         }
+        if RECORD_FILE_IDENTITY and identity:
+            meta["Device"] = stat.st_dev
+            meta["Inode"] = stat.st_ino
+            # Opening a FIFO, socket or device node can block or have side effects
+            if not stat_module.S_ISREG(stat.st_mode):
+                meta["Fingerprint"] = None
+            else:
+                try:
+                    meta["Fingerprint"] = file_fingerprint(file_path, stat.st_size)
+                except OSError:
+                    meta["Fingerprint"] = None  # unreadable content, still indexable by name
+        return meta
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
 
-def dump_linux_data(max_items: int | None, output_file="linux_dump.json"):
+def member_metadata(archive_path, member_path, size, mtime):
+    """Record for a file inside an archive, addressed as archive_path!/member_path"""
+    name = member_path.rpartition("/")[2]
+    _, mime_type, kind = file_type(name)
+    stamp = iso_timestamp(mtime)
+    return {
+        "Path": f"{archive_path}{ARCHIVE_SEPARATOR}{member_path}",
+        "Name": name,
+        "Size": size,
+        "ContentType": mime_type,
+        "Kind": kind,
+        "CreationDate": stamp,  # archives only keep a modification time
+        "ContentChangeDate": stamp,
+        "Archive": archive_path,
+    }
+
+def archive_metadata(archive_path, stat, dir_cache=None, throttle=None):
+    """[(record, mtime), ...] for one archive's members, cached while the archive is unchanged"""
+    key = f"{archive_path}{ARCHIVE_SEPARATOR}"
+    members = dir_cache.record(key, stat) if dir_cache is not None else None
+    if members is None:
+        with throttle.op('record') if throttle else nullcontext():
+            listed = list_members(archive_path, stat.st_size)
+        members = [(member_metadata(archive_path, path, size, mtime), mtime) for path, size, mtime in listed]
+        if dir_cache is not None:
+            dir_cache.remember_record(key, stat, members)
+    return members
+
+def resolve_search_paths():
+    """Expand SEARCH_FOLDERS to existing absolute paths"""
     home_dir = os.path.expanduser("~")
     search_paths = []
 
@@ -59,30 +181,151 @@ def dump_linux_data(max_items: int | None, output_file="linux_dump.json"):
         else:
             print(f"  ✗ {full_path} (not found)")
 
+    return search_paths
+
+def iter_metadata(search_paths, max_items: int | None = None, stats=None, dir_cache=None, throttle=None, progress=None,
+                  checkpoint=None):
+    """Yield metadata records while walking search_paths, up to max_items
+
+    With CRAWL_NEWEST_FIRST and max_items, the crawl continues past max_items and
+    the max_items most recently modified files are yielded at the end, newest first.
+    With a CrawlCheckpoint, records of an interrupted run come first and the walk
+    continues from its saved frontier.
+    """
+    rules = IgnoreRules(IGNORE_PATTERNS, ignore_file_names=IGNORE_FILE_NAMES, roots=search_paths)
+    stats = stats or CrawlStats()
+    throttle = throttle or IOThrottle()
+    newest = NewestFiles(max_items) if CRAWL_NEWEST_FIRST and max_items else None
+    # (st_dev, st_ino) -> (record, checkpoint index) already emitted for that physical file
+    emitted = {}
+
+    def crawl():
+        """(record, mtime) per file, checkpointed records first"""
+        if checkpoint is not None:
+            for index, meta in enumerate(checkpoint.resumed_records()):
+                if DEDUPE_FILES and meta.get("Inode") is not None:
+                    emitted[(meta["Device"], meta["Inode"])] = (meta, index)
+                yield meta, datetime.fromisoformat(meta["ContentChangeDate"]).timestamp()
+
+        scanned = 0
+        for file_path in walk_files(search_paths, rules, stats, dir_cache,
+                                    follow_symlinks=FOLLOW_SYMLINKS,
+                                    one_filesystem=ONE_FILESYSTEM,
+                                    dedupe_dirs=DEDUPE_FILES,
+                                    throttle=throttle,
+                                    newest_first=CRAWL_NEWEST_FIRST,
+                                    checkpoint=checkpoint):
+            if SCAN_BUDGET and scanned >= SCAN_BUDGET:
+                stats.stopped_early = True
+                return
+            scanned += 1
+            try:
+                with throttle.op('stat'):
+                    stat = os.stat(file_path)
+            except OSError as e:
+                print(f"Error processing {file_path}: {e}")
+                continue
+
+            # Older than everything kept so far: skip the record (and fingerprint read)
+            if newest is not None and newest.oldest_mtime is not None and stat.st_mtime <= newest.oldest_mtime:
+                continue
+
+            if DEDUPE_FILES:
+                first = emitted.get((stat.st_dev, stat.st_ino))
+                if first is not None:
+                    first[0].setdefault("Aliases", []).append(file_path)
+                    if checkpoint is not None and first[1] is not None:
+                        checkpoint.add_alias(first[1], file_path)
+                    stats.files_aliased += 1
+                    continue
+
+            # Unchanged size/mtime/ctime: reuse last crawl's record
+            meta = dir_cache.record(file_path, stat) if dir_cache is not None else None
+            if meta is None:
+                # Fingerprinting reads the file, so it counts as a throttled operation too
+                with throttle.op('stat' if RECORD_FILE_IDENTITY else 'record'):
+                    meta = get_metadata(file_path, stat)
+                if meta and dir_cache is not None:
+                    dir_cache.remember_record(file_path, stat, meta)
+            if meta:
+                # Aliases are rediscovered every crawl, never carried over from the cache
+                meta.pop("Aliases", None)
+                index = checkpoint.add_record(meta) if checkpoint is not None else None
+                if DEDUPE_FILES:
+                    emitted[(stat.st_dev, stat.st_ino)] = (meta, index)
+                yield meta, stat.st_mtime
+
+                if INDEX_ARCHIVES and is_archive(meta["Name"]):
+                    for member, mtime in archive_metadata(file_path, stat, dir_cache, throttle):
+                        if checkpoint is not None:
+                            checkpoint.add_record(member)
+                        yield member, mtime
+
+    count = 0
+    for meta, mtime in crawl():
+        count += 1
+        if progress:
+            progress.update(count, stats)
+        if newest is not None:
+            newest.offer(mtime, meta)
+            continue
+        yield meta
+        if max_items and count >= max_items:
+            stats.stopped_early = True
+            return
+
+    if newest is not None:
+        yield from newest.newest_first()
+
+def dump_linux_data(max_items: int | None, output_file="linux_dump.json"):
+    search_paths = resolve_search_paths()
     if not search_paths:
         print("No valid search paths found!")
         return []
 
     print(f"\nScanning filesystem (up to {max_items} items)...")
-    results = []
-    for root_path in search_paths:
-        for root, _, files in os.walk(root_path):
-            for f in files:
-                file_path = os.path.join(root, f)
-                meta = get_metadata(file_path)
-                if meta:
-                    results.append(meta)
-
-                if max_items and len(results) >= max_items:
-                    break
-            if max_items and len(results) >= max_items:
-                break
-        if max_items and len(results) >= max_items:
-            break
+    if IDLE_PRIORITY:
+        set_idle_priority()
+
+    stats = CrawlStats()
+    dir_cache = DirectoryCache(CRAWL_CACHE_FILE) if CRAWL_CACHE_FILE else None
+    backoff = SLOW_IO_BACKOFF
+    if backoff is None:
+        backoff = bool(MAX_STATS_PER_SEC or MAX_DIRS_PER_SEC)
+    throttle = IOThrottle(MAX_STATS_PER_SEC, MAX_DIRS_PER_SEC, backoff=backoff, slow_factor=SLOW_IO_FACTOR)
+    # The previous crawl's file count gives the ETA
+    expected = len(dir_cache.old_records) if dir_cache is not None and dir_cache.old_records else None
+    if max_items and not CRAWL_NEWEST_FIRST:
+        expected = min(expected, max_items) if expected else max_items
+    progress = CrawlProgress(expected)
+
+    checkpoint = None
+    if CRAWL_CHECKPOINT:
+        # Only a crawl with the same settings may continue this checkpoint
+        settings = (search_paths, max_items, IGNORE_PATTERNS, IGNORE_FILE_NAMES, FOLLOW_SYMLINKS,
+                    ONE_FILESYSTEM, DEDUPE_FILES, CRAWL_NEWEST_FIRST, SCAN_BUDGET, RECORD_FILE_IDENTITY,
+                    INDEX_ARCHIVES)
+        checkpoint = CrawlCheckpoint(CRAWL_CHECKPOINT, repr(settings), interval=CHECKPOINT_INTERVAL)
+        if checkpoint.state:
+            print(f"Resuming interrupted crawl: {len(checkpoint.state['frontier'])} folders still pending")
+
+    results = list(iter_metadata(search_paths, max_items, stats, dir_cache, throttle, progress, checkpoint))
+    progress.update(len(results), stats, force=True)
+    print()
+    stats.report()
+    throttle.report()
+    if dir_cache is not None:
+        # A capped crawl only saw part of the tree, and a resumed one didn't record
+        # the folders finished before the interruption; keep the previous cache then
+        if not stats.stopped_early and not (checkpoint and checkpoint.state):
+            dir_cache.save()
+        print(f"  Reused {dir_cache.records_reused} unchanged file records")
 
     # Save to JSON
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
+    if checkpoint:
+        checkpoint.clear()
 
     print(f"\n✓ Saved {len(results)} items to {output_file}")
 
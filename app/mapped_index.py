@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped index loading
+LeannSearcher unpickles the whole passage offset map and, with its default
+warmup, starts an embedding server before the first query. MappedSearcher opens
+a LEANN index without either: the faiss graph is read with IO_FLAG_MMAP by the
+backend itself, passages are read from an mmap of the .passages.jsonl file and
+their offsets are found by binary search in .npy sidecars written at build time.
+Opening costs about the same for any index size, and searcher processes on one
+host share the page cache instead of holding private copies.
+map_npy() is the same idea for the exact index's arrays.
+"""
+
+import json
+import mmap
+import os
+import pickle
+
+import numpy as np
+
+# Sorted passage ids and their byte offsets in .passages.jsonl
+PASSAGE_KEYS_SUFFIX = ".passages.keys.npy"
+PASSAGE_OFFSETS_SUFFIX = ".passages.offsets.npy"
+
+# madvise hints by name; platforms without madvise (Windows) skip them
+ADVICE = {
+    "normal": getattr(mmap, "MADV_NORMAL", None),
+    "random": getattr(mmap, "MADV_RANDOM", None),        # no read-ahead: single passages, rerank rows
+    "sequential": getattr(mmap, "MADV_SEQUENTIAL", None),
+    "willneed": getattr(mmap, "MADV_WILLNEED", None),    # start reading the whole file in the background
+}
+
+
+def advise(mapped, advice):
+    """Apply a madvise hint by name to an mmap; returns False when it couldn't"""
+    flag = ADVICE.get(advice) if advice else None
+    if flag is None or not hasattr(mapped, "madvise"):
+        return False
+    try:
+        mapped.madvise(flag)
+    except OSError:
+        return False
+    return True
+
+
+def map_file(path, advice=None):
+    """Read-only mmap of a whole file, or None for an empty file (mmap can't map those)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    advise(mapped, advice)
+    return mapped
+
+
+def map_npy(path, advice=None):
+    """Memory-mapped array from a .npy file, like np.load(path, mmap_mode="r") plus a madvise hint"""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran_order, dtype = read_header(f)
+        header_size = f.tell()
+    count = int(np.prod(shape))
+    if count == 0 or dtype.hasobject:
+        return np.load(path, mmap_mode="r")
+    mapped = map_file(path, advice)
+    array = np.frombuffer(mapped, dtype=dtype, count=count, offset=header_size)
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def write_passage_offsets(index_path):
+    """Write the sorted id / offset sidecars for a LEANN index's .passages.idx
+
+    Run once after each build; MappedSearcher falls back to the pickle without them.
+    """
+    with open(f"{index_path}.passages.idx", "rb") as f:
+        offset_map = pickle.load(f)
+    keys = np.array(sorted(offset_map), dtype=str)
+    offsets = np.array([offset_map[key] for key in keys], dtype=np.int64)
+    for suffix, array in ((PASSAGE_KEYS_SUFFIX, keys), (PASSAGE_OFFSETS_SUFFIX, offsets)):
+        tmp_path = f"{index_path}{suffix}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, f"{index_path}{suffix}")
+
+
+class MappedPassages:
+    """passage_manager stand-in reading passages straight out of a mapped .passages.jsonl"""
+
+    def __init__(self, index_path, advice="random"):
+        self.data = map_file(f"{index_path}.passages.jsonl", advice)
+        if os.path.exists(f"{index_path}{PASSAGE_OFFSETS_SUFFIX}"):
+            self.keys = map_npy(f"{index_path}{PASSAGE_KEYS_SUFFIX}", "random")
+            self.offsets = map_npy(f"{index_path}{PASSAGE_OFFSETS_SUFFIX}", "random")
+            self.offset_map = None
+        else:
+            # Index built before the sidecars existed: same cost as LeannSearcher
+            with open(f"{index_path}.passages.idx", "rb") as f:
+                self.offset_map = pickle.load(f)
+            self.keys = self.offsets = None
+
+    def __len__(self):
+        return len(self.offset_map) if self.offset_map is not None else len(self.keys)
+
+    def offset(self, passage_id):
+        passage_id = str(passage_id)
+        if self.offset_map is not None:
+            return self.offset_map[passage_id]
+        pos = int(np.searchsorted(self.keys, passage_id))
+        if pos >= len(self.keys) or self.keys[pos] != passage_id:
+            raise KeyError(f"Passage ID not found: {passage_id}")
+        return int(self.offsets[pos])
+
+    def get_passage(self, passage_id):
+        start = self.offset(passage_id)
+        if self.data is None:
+            # Empty .passages.jsonl (map_file can't map it): no passage exists
+            raise KeyError(f"Passage ID not found: {passage_id}")
+        end = self.data.find(b"\n", start)
+        return json.loads(self.data[start:end if end >= 0 else len(self.data)])
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+
+
+class MappedSearcher:
+    """LEANN index opened without unpickling passages or warming up an embedding server
+
+    Exposes the LeannSearcher attributes leann_query.py relies on.
+    shared_server=False makes a recompute-mode index start its own embedding
+    server, which cleanup() stops. By default LEANN starts a daemon shared by
+    every process searching the index, which outlives the searcher.
+    """
+
+    def __init__(self, index_path, passage_advice="random", shared_server=True):
+        from leann import BACKEND_REGISTRY
+
+        with open(f"{index_path}.meta.json", "r", encoding="utf-8") as f:
+            self.meta_data = json.load(f)
+        self.index_path = index_path
+        self.backend_name = self.meta_data["backend_name"]
+        self.embedding_model = self.meta_data["embedding_model"]
+        self.embedding_mode = self.meta_data.get("embedding_mode", "sentence-transformers")
+        self.embedding_options = self.meta_data.get("embedding_options") or {}
+        self.passage_manager = MappedPassages(index_path, passage_advice)
+
+        backend_factory = BACKEND_REGISTRY.get(self.backend_name)
+        if backend_factory is None:
+            raise ValueError(f"Backend '{self.backend_name}' not found.")
+        kwargs = {**self.meta_data.get("backend_kwargs", {}), "enable_warmup": False,
+                  "use_daemon": shared_server}
+        if self.embedding_options:
+            kwargs["embedding_options"] = self.embedding_options
+        self.backend_impl = backend_factory.searcher(index_path, **kwargs)
+
+    def cleanup(self):
+        server = getattr(self.backend_impl, "embedding_server_manager", None)
+        if server is not None:
+            server.stop_server()
+        close = getattr(self.backend_impl, "close", None)
+        if close is not None:
+            close()
+        self.passage_manager.close()
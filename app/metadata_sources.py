@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Pluggable metadata sources for the Linux dumper
+Builds the same records as linux_index_dump.py from file inventories that
+already exist (plocate/mlocate databases, `find -printf` output, plain path
+lists such as backup manifests) instead of re-walking the tree. Lists are read
+as a stream; only entries without size/dates are stat'ed, in batches on a
+thread pool.
+"""
+
+import json
+import os
+import shutil
+import stat as stat_module
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from crawler import IgnoreRules, CrawlStats
+from linux_index_dump import IGNORE_PATTERNS, resolve_search_paths, get_metadata
+
+# Format expected by FindPrintfSource; path last so tabs in names survive:
+#   find ~/Documents -printf '%y\t%s\t%T@\t%C@\t%p\n' > documents.list
+FIND_PRINTF_FORMAT = r"%y\t%s\t%T@\t%C@\t%p\n"
+
+# Entries that need an os.stat are stat'ed STAT_BATCH at a time on STAT_THREADS threads
+STAT_THREADS = 16
+STAT_BATCH = 512
+
+# Device/inode/fingerprint need a stat and a read of every file; off by default
+# so a listed inventory is ingested at read speed (moved files then get new ids)
+SOURCE_RECORD_IDENTITY = False
+
+# One inventory line: size/mtime/ctime are None when the list doesn't carry them,
+# is_dir is None when the list doesn't say
+ListedFile = namedtuple("ListedFile", ["path", "size", "mtime", "ctime", "is_dir"])
+
+
+def _read_records(stream, separator):
+    """Split a binary stream on separator without loading it whole"""
+    pending = b""
+    while True:
+        chunk = stream.read(1 << 16)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(separator)
+        for record in records:
+            if record:
+                yield os.fsdecode(record)
+    if pending:
+        yield os.fsdecode(pending)
+
+
+def _open_list(list_file):
+    return sys.stdin.buffer if list_file == "-" else open(list_file, "rb")
+
+
+class PathListSource:
+    """One path per line (or NUL-separated with null_separated=True); '-' reads stdin"""
+
+    def __init__(self, list_file, null_separated=False):
+        self.list_file = list_file
+        self.separator = b"\0" if null_separated else b"\n"
+
+    def entries(self, search_paths):
+        stream = _open_list(self.list_file)
+        try:
+            for line in _read_records(stream, self.separator):
+                path = line.rstrip("\r")
+                if path:
+                    yield ListedFile(path, None, None, None, None)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+
+class FindPrintfSource:
+    """Output of find -printf in FIND_PRINTF_FORMAT; needs no stat at all"""
+
+    def __init__(self, list_file):
+        self.list_file = list_file
+
+    def entries(self, search_paths):
+        stream = _open_list(self.list_file)
+        try:
+            for line in _read_records(stream, b"\n"):
+                fields = line.split("\t", 4)
+                if len(fields) != 5:
+                    continue  # not our format (or a truncated last line)
+                kind, size, mtime, ctime, path = fields
+                try:
+                    yield ListedFile(path, int(size), float(mtime), float(ctime), kind == "d")
+                except ValueError:
+                    yield ListedFile(path, None, None, None, kind == "d")
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+
+class LocateSource:
+    """Paths under the search folders from the plocate/mlocate database
+
+    The database is only as fresh as the last updatedb run: new files are
+    missing and deleted ones are dropped when their stat fails.
+    """
+
+    COMMANDS = ("plocate", "mlocate", "locate")
+
+    def __init__(self, command=None):
+        self.command = command or next((c for c in self.COMMANDS if shutil.which(c)), None)
+
+    def entries(self, search_paths):
+        if self.command is None:
+            raise RuntimeError("no locate command found (install plocate or mlocate)")
+        for root in search_paths:
+            # Substring match; paths that merely contain root are filtered out later
+            proc = subprocess.Popen([self.command, "-0", root.rstrip("/") + "/"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                for path in _read_records(proc.stdout, b"\0"):
+                    yield ListedFile(path, None, None, None, None)
+            finally:
+                proc.stdout.close()
+                proc.wait()
+
+
+class _IgnoreFilter:
+    """IGNORE_PATTERNS applied to listed paths, including every parent directory
+
+    A walk prunes ignored directories; a list has to check each entry's
+    ancestors instead. Ancestor results are memoised since lists are usually
+    grouped by directory. Per-directory ignore files are not read. Like a walk,
+    only directories below the search roots are checked, never a root itself
+    or the folders above it.
+    """
+
+    def __init__(self, rules, stats, roots):
+        self.rules = rules
+        self.stats = stats
+        self.roots = {root.rstrip("/") or "/" for root in roots}
+        self.dirs = {}
+
+    def _dir_ignored(self, dir_path):
+        ignored = self.dirs.get(dir_path)
+        if ignored is None:
+            if dir_path in self.roots or not _under(dir_path, self.roots):
+                ignored = False
+            elif self._dir_ignored(os.path.dirname(dir_path)):
+                ignored = True
+            else:
+                ignored = self.rules.ignored(dir_path, True)
+                if ignored:
+                    self.stats.dirs_pruned += 1
+                    self.stats.pruned_names[os.path.basename(dir_path)] += 1
+            self.dirs[dir_path] = ignored
+        return ignored
+
+    def ignored(self, path, is_dir):
+        if self._dir_ignored(os.path.dirname(path)):
+            return True
+        return self.rules.ignored(path, bool(is_dir))
+
+
+def _under(path, search_paths):
+    return any(path == root or path.startswith(root.rstrip("/") + "/") for root in search_paths)
+
+
+def _stat_record(entry):
+    """Record for an entry the list gave no size/dates for; None for dirs and stale entries"""
+    try:
+        st = os.stat(entry.path)
+    except OSError:
+        return None
+    if stat_module.S_ISDIR(st.st_mode):
+        return None
+    return get_metadata(entry.path, st, identity=SOURCE_RECORD_IDENTITY)
+
+
+def _listed_record(entry):
+    """Record built from the list's own fields, without touching the file"""
+    st = SimpleNamespace(st_size=entry.size, st_mtime=entry.mtime, st_ctime=entry.ctime)
+    return get_metadata(entry.path, st, identity=False)
+
+
+def iter_source_metadata(source, search_paths, max_items=None, stats=None):
+    """Yield linux_index_dump-style records for the files a source lists under search_paths"""
+    stats = stats or CrawlStats()
+    ignore = _IgnoreFilter(IgnoreRules(IGNORE_PATTERNS, roots=search_paths), stats, search_paths)
+    count = 0
+
+    def batches():
+        batch = []
+        for entry in source.entries(search_paths):
+            if entry.is_dir or not _under(entry.path, search_paths):
+                continue
+            if ignore.ignored(entry.path, entry.is_dir):
+                stats.files_ignored += 1
+                continue
+            batch.append(entry)
+            if len(batch) >= STAT_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    with ThreadPoolExecutor(max_workers=STAT_THREADS) as pool:
+        for batch in batches():
+            complete = [e for e in batch if None not in (e.size, e.mtime, e.ctime)]
+            records = [_listed_record(e) for e in complete]
+            to_stat = [e for e in batch if None in (e.size, e.mtime, e.ctime)]
+            for record in pool.map(_stat_record, to_stat):
+                if record is None:
+                    stats.errors += 1  # deleted since the list was made, or a directory
+                records.append(record)
+
+            for record in records:
+                if record is None:
+                    continue
+                yield record
+                count += 1
+                if max_items and count >= max_items:
+                    stats.stopped_early = True
+                    return
+
+
+def dump_from_source(source, max_items=None, output_file="linux_dump.json"):
+    """Same output as linux_index_dump.dump_linux_data, fed by a file inventory"""
+    search_paths = resolve_search_paths()
+    if not search_paths:
+        print("No valid search paths found!")
+        return []
+
+    print(f"\nReading {type(source).__name__} (up to {max_items} items)...")
+    start = time.time()
+    stats = CrawlStats()
+    results = list(iter_source_metadata(source, search_paths, max_items, stats))
+    elapsed = time.time() - start
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"Read {len(results)} files in {elapsed:.2f}s ({rate:.0f} files/s)")
+    print(f"  {stats.files_ignored} ignored ({stats.dirs_pruned} ignored directories), "
+          f"{stats.errors} stale or unreadable entries")
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n✓ Saved {len(results)} items to {output_file}")
+    return results
+
+
+def main():
+    usage = ("Usage: python metadata_sources.py locate [number_of_items] [output.json]\n"
+             "       python metadata_sources.py find-printf <list_file|-> [number_of_items] [output.json]\n"
+             "       python metadata_sources.py list <list_file|-> [number_of_items] [output.json]\n"
+             "       python metadata_sources.py list0 <list_file|-> [number_of_items] [output.json]")
+    args = sys.argv[1:]
+    if not args or args[0] not in ("locate", "find-printf", "list", "list0"):
+        print(usage)
+        sys.exit(1)
+
+    kind = args.pop(0)
+    if kind == "locate":
+        source = LocateSource()
+    else:
+        if not args:
+            print(usage)
+            sys.exit(1)
+        list_file = args.pop(0)
+        if kind == "find-printf":
+            source = FindPrintfSource(list_file)
+        else:
+            source = PathListSource(list_file, null_separated=(kind == "list0"))
+
+    try:
+        max_items = int(args[0]) if args else None
+    except ValueError:
+        print(usage)
+        sys.exit(1)
+    output_file = args[1] if len(args) > 1 else "linux_dump.json"
+    dump_from_source(source, max_items=max_items, output_file=output_file)
+
+
+if __name__ == "__main__":
+    main()
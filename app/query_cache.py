@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+In-process query caches for the LEANN search path
+QueryEmbeddingCache skips re-encoding repeated cleaned query text
+SemanticQueryCache reuses candidate lists for near-identical query embeddings
+"""
+
+import random
+from collections import OrderedDict
+import numpy as np
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class QueryEmbeddingCache:
+    """LRU of (model id, cleaned query text) -> query embedding"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+
+    def get(self, model_id, text):
+        self.lookups += 1
+        key = (model_id, text)
+        embedding = self.entries.get(key)
+        if embedding is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return embedding
+
+    def put(self, model_id, text, embedding):
+        if self.max_entries <= 0:
+            return
+        self.entries[(model_id, text)] = embedding
+        self.entries.move_to_end((model_id, text))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+
+class SemanticQueryCache:
+    """Reuse the candidate list of a recent query whose embedding is within a cosine threshold"""
+
+    def __init__(self, threshold=0.95, max_entries=256, verify_rate=0.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Fraction of hits that also run the exact search to measure drift
+        self.verify_rate = verify_rate
+
+        # Parallel lists, oldest first; a hit moves its entry to the end
+        self.embeddings = []
+        self.entries = []
+
+        self.lookups = 0
+        self.hits = 0
+        self.verified = 0
+        self.overlap_total = 0.0
+
+    def lookup(self, query_embedding, top_k):
+        """Return (candidates, similarity) for the closest cached query, or (None, best_similarity)
+
+        top_k=None returns the whole cached list, e.g. for a filtered query to filter.
+        """
+        self.lookups += 1
+        if not self.embeddings:
+            return None, 0.0
+
+        query = _normalize(query_embedding)
+        similarities = np.stack(self.embeddings) @ query
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+
+        entry = self.entries[best]
+        # A cached list built for a smaller top_k can't answer a larger request
+        if similarity < self.threshold or (top_k is not None and entry['top_k'] < top_k):
+            return None, similarity
+
+        self.hits += 1
+        self.embeddings.append(self.embeddings.pop(best))
+        self.entries.append(self.entries.pop(best))
+        return entry['candidates'][:top_k], similarity
+
+    def store(self, query_embedding, top_k, candidates):
+        """Remember the unfiltered candidate list for this query embedding"""
+        self.embeddings.append(_normalize(query_embedding))
+        self.entries.append({'top_k': top_k, 'candidates': list(candidates)})
+        while len(self.entries) > self.max_entries:
+            self.embeddings.pop(0)
+            self.entries.pop(0)
+
+    def should_verify(self):
+        """Decide whether this hit should also run the exact search"""
+        return self.verify_rate > 0 and random.random() < self.verify_rate
+
+    def record_drift(self, reused, exact):
+        """Record how many of the exact top results the reused candidate list contains"""
+        exact_ids = {r.id for r in exact}
+        if not exact_ids:
+            return
+        reused_ids = {r.id for r in reused}
+        self.verified += 1
+        self.overlap_total += len(exact_ids & reused_ids) / len(exact_ids)
+
+    def clear(self):
+        self.embeddings.clear()
+        self.entries.clear()
+
+    def stats(self):
+        """Hit rate and measured overlap between reused and exact results"""
+        return {
+            'entries': len(self.entries),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'verified_hits': self.verified,
+            'mean_overlap_with_exact': self.overlap_total / self.verified if self.verified else None,
+        }
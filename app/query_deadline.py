@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-request search deadlines
+A Deadline is created for each search and handed to every stage. Stages that
+can stop early (the exact backend's block scan, post-filter retries) check it
+and keep what they found so far; stages that can't (query encoding, the HNSW
+graph search) run on a worker thread that is abandoned when time runs out.
+An abandoned stage still finishes in the background, so e.g. the query
+embedding lands in the embedding cache and the next try is fast.
+"""
+
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+# Threads for blocking stages; abandoned stages keep one busy until they finish
+DEADLINE_WORKERS = 4
+# Recent request latencies kept for the percentiles in DeadlineStats.stats()
+LATENCY_WINDOW = 1000
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix="deadline")
+    return _executor
+
+
+class DeadlineExceeded(Exception):
+    """A stage ran out of time before producing anything usable"""
+
+    def __init__(self, stage):
+        super().__init__(f"deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """Time budget of one search request; budget_ms None never expires"""
+
+    def __init__(self, budget_ms=None):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter()
+        self.expires = self.start + budget_ms / 1000 if budget_ms is not None else None
+        # First stage that gave up early, None while the results are complete
+        self.stage = None
+
+    @property
+    def partial(self):
+        return self.stage is not None
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining(self):
+        """Seconds left, None without a budget"""
+        if self.expires is None:
+            return None
+        return max(self.expires - time.perf_counter(), 0.0)
+
+    def expired(self):
+        return self.expires is not None and time.perf_counter() >= self.expires
+
+    def cut_short(self, stage):
+        """Record that stage returned what it had when time ran out"""
+        if self.stage is None:
+            self.stage = stage
+
+    def check(self, stage):
+        """Raise DeadlineExceeded when time ran out before stage"""
+        if self.expired():
+            self.cut_short(stage)
+            raise DeadlineExceeded(stage)
+
+    def run(self, stage, function, *args, **kwargs):
+        """function(*args, **kwargs), or DeadlineExceeded if it doesn't return in time"""
+        self.check(stage)
+        if self.expires is None:
+            return function(*args, **kwargs)
+        future = _pool().submit(function, *args, **kwargs)
+        try:
+            return future.result(timeout=self.remaining())
+        except FutureTimeout:
+            future.cancel()  # Only helps if it was still queued
+            self.cut_short(stage)
+            raise DeadlineExceeded(stage) from None
+
+
+class SearchResults(list):
+    """Search results, plus whether a deadline cut them short and in which stage"""
+
+    def __init__(self, results=(), deadline=None):
+        super().__init__(results)
+        self.partial = deadline.partial if deadline is not None else False
+        self.stage = deadline.stage if deadline is not None else None
+        self.elapsed_ms = deadline.elapsed_ms if deadline is not None else None
+
+
+class DeadlineStats:
+    """Request latencies and timeouts (partial results) per stage"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.timeouts = Counter()
+
+    def record(self, deadline):
+        self.requests += 1
+        self.latencies.append(deadline.elapsed_ms)
+        if deadline.partial:
+            self.timeouts[deadline.stage] += 1
+
+    def stats(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        timeouts = sum(self.timeouts.values())
+        return {
+            'requests': self.requests,
+            'timeouts': timeouts,
+            'timeout_rate': timeouts / self.requests if self.requests else 0.0,
+            'timeouts_by_stage': dict(self.timeouts),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max()),
+        }
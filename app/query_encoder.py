@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+CPU-optimized query encoders
+Encoding the query with the full-precision sentence-transformer is most of a
+search's latency on CPU-only hosts. These encoders load a local copy of the
+index's embedding model either dynamically quantized to int8 ("torch-int8") or
+exported to ONNX ("onnx", optionally an int8-quantized ONNX file), with a fixed
+number of intra-op threads, and warm up on load.
+A faster encoder is only used after embedding_drift() shows it still agrees
+with the model the index was built with.
+
+Export an ONNX copy (plus an int8 one) once with:
+    python query_encoder.py export <model name or path> <output dir>
+"""
+
+import sys
+import time
+
+import numpy as np
+
+ONNX_FILE = "onnx/model.onnx"
+QUANTIZED_ONNX_FILE = "onnx/model_qint8_avx2.onnx"
+ENCODER_THREADS = 4
+
+# Encoded on load (first inference allocates and tunes kernels) and used for the drift check
+WARMUP_QUERIES = [
+    "quarterly report",
+    "photos from the beach trip",
+    "python scripts for parsing logs",
+    "invoice pdf",
+    "resume",
+]
+# Lowest cosine similarity to the reference embeddings accepted for any warmup query
+MIN_COSINE = 0.99
+
+
+class QueryEncoder:
+    """Sentence-transformer query encoder loaded for low-latency CPU inference
+
+    kind: "torch-int8" or "onnx"; onnx_file picks the ONNX graph inside model_path
+    """
+
+    def __init__(self, kind, model_path, threads=ENCODER_THREADS, onnx_file=ONNX_FILE):
+        from sentence_transformers import SentenceTransformer
+
+        self.kind = kind
+        self.model_path = model_path
+        self.threads = threads
+        start = time.time()
+        if kind == "torch-int8":
+            import torch
+
+            # Process-wide: torch has no per-model thread pool, so this also sets
+            # the thread count of LEANN's own encoder in this process
+            torch.set_num_threads(threads)
+            model = SentenceTransformer(model_path, device="cpu")
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif kind == "onnx":
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            self.model = SentenceTransformer(model_path, device="cpu", backend="onnx", model_kwargs={
+                "file_name": onnx_file,
+                "provider": "CPUExecutionProvider",
+                "session_options": options,
+            })
+            self.kind = f"onnx:{onnx_file}"
+        else:
+            raise ValueError(f"unknown query encoder '{kind}' (use 'torch-int8' or 'onnx')")
+        self.encode(WARMUP_QUERIES)
+        self.load_seconds = time.time() - start
+
+    @property
+    def name(self):
+        return f"{self.kind}:{self.model_path}"
+
+    def encode(self, texts):
+        """(len(texts), D) float32 embeddings, unnormalized like LEANN's own encoder"""
+        embeddings = self.model.encode(list(texts), batch_size=len(texts) or 1, convert_to_numpy=True,
+                                       normalize_embeddings=False, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+def embedding_drift(encoder, reference_encode, texts=WARMUP_QUERIES):
+    """Cosine similarity per text between encoder and reference_encode(texts) embeddings"""
+    ours = encoder.encode(texts)
+    reference = np.asarray(reference_encode(texts), dtype=np.float32)
+    norms = np.linalg.norm(ours, axis=1) * np.linalg.norm(reference, axis=1)
+    return (ours * reference).sum(axis=1) / np.maximum(norms, 1e-12)
+
+
+_checked = {}
+
+
+def encoder_for_index(searcher, kind, model_path=None, threads=ENCODER_THREADS, onnx_file=ONNX_FILE):
+    """QueryEncoder for this index's model, or None if it can't be loaded or drifts too far
+
+    model_path defaults to the index's embedding model. Loading and the drift check
+    against the index's own encoder happen once per process and model.
+    """
+    model_path = model_path or searcher.embedding_model
+    key = (kind, model_path, threads, onnx_file, searcher.embedding_model)
+    if key in _checked:
+        return _checked[key]
+
+    from leann.api import compute_embeddings
+
+    def reference_encode(texts):
+        return compute_embeddings(texts, searcher.embedding_model, searcher.embedding_mode,
+                                  use_server=False, provider_options=searcher.embedding_options)
+
+    encoder = None
+    try:
+        candidate = QueryEncoder(kind, model_path, threads, onnx_file)
+    except (ImportError, OSError, RuntimeError) as e:
+        # Missing optional package, model files or ONNX graph; anything else is a bug
+        print(f"Query encoder '{kind}' unavailable ({e.__class__.__name__}: {e}); using the default encoder")
+        candidate = None
+    if candidate is not None:
+        cosine = embedding_drift(candidate, reference_encode)
+        if cosine.min() >= MIN_COSINE:
+            encoder = candidate
+            print(f"Query encoder: {candidate.name} ({candidate.load_seconds:.1f}s to load, "
+                  f"min cosine {cosine.min():.4f})")
+        else:
+            print(f"Query encoder {candidate.name} drifts from the index's model "
+                  f"(min cosine {cosine.min():.4f} < {MIN_COSINE}); using the default encoder")
+    _checked[key] = encoder
+    return encoder
+
+
+def export_onnx(model_name, output_dir):
+    """Save model_name with an ONNX graph and a dynamically int8-quantized copy of it"""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    # Loading with the onnx backend exports the graph when the model has none
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    model.save(output_dir)
+    export_dynamic_quantized_onnx_model(model, "avx2", output_dir)
+    print(f"✓ Exported {model_name} to {output_dir} ({ONNX_FILE}, {QUANTIZED_ONNX_FILE})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "export":
+        print("Usage: python query_encoder.py export <model name or path> <output dir>")
+        sys.exit(1)
+    export_onnx(sys.argv[2], sys.argv[3])
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Cost-based planning of filtered searches
+A query's constraints (time range, file type, folder) are estimated against
+per-index statistics written at build time, then one strategy is picked:
+    brute       few files match: score just those vectors exactly
+    masked      exact backend: one scan with the non-matching rows masked out
+    post-filter search for top_k / selectivity candidates, filter them afterwards
+Each plan reports its estimated cost and matches next to the measured ones.
+
+Build-time files next to the index:
+    <index>.filter.dates.npy  modification (or creation) date per row, ISO string
+    <index>.filter.exts.npy   lowercased file extension per row
+    <index>.filter.dirs.npy   lowercased parent directory per row
+    <index>.filter.ids.npy    passage id per row
+    <index>.filter.json       row count, date quantiles, extension and folder name counts
+"""
+
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from embedding_store import VECTORS_SUFFIX
+from file_records import extension
+from mapped_index import map_npy
+
+STATS_SUFFIX = ".filter.json"
+COLUMN_SUFFIXES = {name: f".filter.{name}.npy" for name in ("dates", "exts", "dirs", "ids")}
+
+# Query words -> file type group, and the extensions in each group
+TYPE_GROUPS = {
+    "image": (("image", "images", "photo", "photos", "picture", "pictures", "screenshot", "screenshots"),
+              {".jpg", ".jpeg", ".png", ".gif", ".heic", ".webp", ".bmp", ".tiff", ".svg", ".raw"}),
+    "video": (("video", "videos", "movie", "movies", "clip", "clips", "recording", "recordings"),
+              {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v"}),
+    "audio": (("audio", "song", "songs", "music", "podcast", "podcasts"),
+              {".mp3", ".wav", ".flac", ".m4a", ".aac", ".ogg"}),
+    "pdf": (("pdf", "pdfs"), {".pdf"}),
+    "document": (("document", "documents", "doc", "docs"),
+                 {".pdf", ".doc", ".docx", ".odt", ".rtf", ".txt", ".md", ".pages"}),
+    "spreadsheet": (("spreadsheet", "spreadsheets", "excel", "csv"),
+                    {".xls", ".xlsx", ".csv", ".ods", ".numbers"}),
+    "presentation": (("presentation", "presentations", "slides", "slideshow"),
+                     {".ppt", ".pptx", ".key", ".odp"}),
+    "code": (("code", "script", "scripts", "source"),
+             {".py", ".js", ".ts", ".c", ".cpp", ".h", ".java", ".go", ".rs", ".rb", ".sh", ".swift"}),
+    "archive": (("archive", "archives", "zip", "zips"), {".zip", ".tar", ".gz", ".tgz", ".7z", ".rar"}),
+}
+_WORD_GROUP = {word: group for group, (words, _) in TYPE_GROUPS.items() for word in words}
+# Words that are often not about file types ("zip code", "source of", "film clip"):
+# only a filter when next to "file(s)" or another word of their group ("source code")
+AMBIGUOUS_TYPE_WORDS = {"code", "source", "doc", "clip", "recording", "zip"}
+_FILE_WORDS = {"file", "files"}
+
+
+def type_extensions(groups):
+    """Extensions of any of the type groups"""
+    return set().union(*(TYPE_GROUPS[group][1] for group in groups))
+
+# "in my Downloads folder", "from ~/Documents", "under projects"
+_FOLDER_PATTERN = re.compile(r"\b(?:in|from|under|inside)\s+(?:the\s+|my\s+)?~?/?([\w.-]+(?:/[\w.-]+)*)"
+                             r"(\s+(?:folder|directory|dir)\b)?", re.IGNORECASE)
+
+# Folder names and extensions kept in the statistics; others count as rare
+MAX_FOLDER_NAMES = 5000
+MAX_EXTENSIONS = 1000
+DATE_QUANTILES = 200
+# Selectivity assumed for a constraint without statistics
+DEFAULT_SELECTIVITY = 0.1
+
+# Cost model, milliseconds per unit (rough, CPU-bound NumPy/Python on a laptop)
+MASK_MS_PER_ROW = 0.00005      # evaluating constraints over the filter columns
+BRUTE_MS_PER_ROW = 0.002       # gathering and scoring one stored vector
+SCAN_MS_PER_ROW = 0.00003      # exact backend scan, per row
+GRAPH_SEARCH_MS = 3.0          # one HNSW search, excluding passages
+PASSAGE_MS = 0.03              # reading and filtering one candidate passage
+BRUTE_MAX_ROWS = 50000         # never brute-force more rows than this
+
+# Post-filtering fetches top_k / selectivity * OVERFETCH candidates, at most MAX_FETCH
+OVERFETCH = 2.0
+MAX_FETCH = 2000
+
+
+def file_extension(path):
+    return extension(os.path.basename(str(path))).lower()
+
+
+def _row_date(metadata):
+    return metadata.get('modification_date') or metadata.get('creation_date') or ""
+
+
+def write_filter_columns(index_path, ids, chunks):
+    """Write the filter columns and statistics for passages chunks[i] with id ids[i]"""
+    dates, exts, dirs = [], [], []
+    folder_counts = Counter()
+    for chunk in chunks:
+        metadata = chunk.get("metadata", {})
+        path = str(metadata.get('path', ""))
+        dates.append(_row_date(metadata))
+        exts.append(file_extension(path))
+        directory = os.path.dirname(path).lower()
+        dirs.append(directory)
+        folder_counts.update(set(part for part in directory.split("/") if part))
+
+    columns = {
+        "dates": np.array(dates, dtype=str),
+        "exts": np.array(exts, dtype=str),
+        "dirs": np.array(dirs, dtype=str),
+        "ids": np.array([str(i) for i in ids], dtype=str),
+    }
+    for name, array in columns.items():
+        path = f"{index_path}{COLUMN_SUFFIXES[name]}"
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(f"{path}.tmp", path)
+
+    sorted_dates = np.sort(columns["dates"][columns["dates"] != ""])
+    positions = np.linspace(0, len(sorted_dates) - 1, min(DATE_QUANTILES, len(sorted_dates))).astype(int)
+    stats = {
+        "count": len(chunks),
+        "dated": int(len(sorted_dates)),
+        "date_quantiles": sorted_dates[positions].tolist() if len(sorted_dates) else [],
+        "extension_counts": dict(Counter(exts).most_common(MAX_EXTENSIONS)),
+        "folder_counts": dict(folder_counts.most_common(MAX_FOLDER_NAMES)),
+    }
+    with open(f"{index_path}{STATS_SUFFIX}", "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False)
+
+
+class Constraint:
+    """One filter: kind "time" (value (start, end) ISO strings), "type" (tuple of groups) or "folder" (name)"""
+
+    def __init__(self, kind, value, text=""):
+        self.kind = kind
+        self.value = value
+        self.text = text
+
+    def __repr__(self):
+        if self.kind == "time":
+            value = f"{self.value[0][:10]}..{self.value[1][:10]}"
+        elif self.kind == "type":
+            value = "|".join(self.value)
+        else:
+            value = self.value
+        return f"{self.kind}={value}"
+
+    def matches(self, metadata):
+        """Whether one passage's metadata satisfies the constraint"""
+        if self.kind == "time":
+            date = _row_date(metadata)
+            return bool(date) and self.value[0] <= date <= self.value[1]
+        path = str(metadata.get('path', ""))
+        if self.kind == "type":
+            return file_extension(path) in type_extensions(self.value)
+        return f"/{self.value}/" in os.path.dirname(path).lower() + "/"
+
+
+def extract_constraints(text, known_folders=None):
+    """(text without folder phrases, [type and folder Constraints]) parsed from a query
+
+    Type words stay in the text, they help the semantic match too. All of them
+    form one constraint matching any of their types ("photos and videos").
+    AMBIGUOUS_TYPE_WORDS only count next to a word confirming them. "in X" only
+    counts as a folder when followed by "folder" or when X is in known_folders.
+    """
+    constraints = []
+    for match in _FOLDER_PATTERN.finditer(text):
+        name = match.group(1).lower().rstrip("/").rsplit("/", 1)[-1]
+        if match.group(2) or (known_folders is not None and name in known_folders):
+            constraints.append(Constraint("folder", name, match.group(0)))
+            text = text.replace(match.group(0), " ")
+
+    # After folder phrases are gone, so "in Documents" isn't also a type
+    words = re.findall(r"\w+", text.lower())
+    groups, type_words = [], []
+    for i, word in enumerate(words):
+        group = _WORD_GROUP.get(word)
+        if group is None:
+            continue
+        if word in AMBIGUOUS_TYPE_WORDS:
+            neighbours = words[max(i - 1, 0):i] + words[i + 1:i + 2]
+            if not any(n in _FILE_WORDS or _WORD_GROUP.get(n) == group for n in neighbours):
+                continue
+        type_words.append(word)
+        if group not in groups:
+            groups.append(group)
+    if groups:
+        constraints.append(Constraint("type", tuple(sorted(groups)), " ".join(type_words)))
+    return " ".join(text.split()), constraints
+
+
+class FilterIndex:
+    """An index's filter columns (memory-mapped) and statistics, if it was built with them"""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(f"{index_path}{STATS_SUFFIX}", "r", encoding="utf-8") as f:
+            self.stats = json.load(f)
+        self.columns = {name: map_npy(f"{index_path}{suffix}") for name, suffix in COLUMN_SUFFIXES.items()}
+        self.vectors = None
+
+    @classmethod
+    def load(cls, index_path):
+        if not os.path.exists(f"{index_path}{STATS_SUFFIX}"):
+            return None
+        return cls(index_path)
+
+    @property
+    def known_folders(self):
+        return self.stats["folder_counts"]
+
+    def selectivity(self, constraint):
+        """Estimated fraction of rows matching one constraint"""
+        count = max(self.stats["count"], 1)
+        if constraint.kind == "time":
+            quantiles = self.stats["date_quantiles"]
+            if not quantiles:
+                return 0.0
+            start, end = constraint.value
+            inside = sum(1 for q in quantiles if start <= q <= end)
+            # At least one quantile step when the range falls between two quantiles
+            return max(inside, 0.5) / len(quantiles) * self.stats["dated"] / count
+        if constraint.kind == "type":
+            counts = self.stats["extension_counts"]
+            return sum(counts.get(ext, 0) for ext in type_extensions(constraint.value)) / count
+        folders = self.stats["folder_counts"]
+        if constraint.value in folders:
+            return folders[constraint.value] / count
+        # Not among the most common names: rarer than all of them
+        return (min(folders.values()) if folders else 1) / count
+
+    def mask(self, constraints):
+        """Boolean row mask of rows matching every constraint"""
+        mask = np.ones(self.stats["count"], dtype=bool)
+        for constraint in constraints:
+            if constraint.kind == "time":
+                dates = self.columns["dates"]
+                mask &= (dates >= constraint.value[0]) & (dates <= constraint.value[1])
+            elif constraint.kind == "type":
+                mask &= np.isin(self.columns["exts"], sorted(type_extensions(constraint.value)))
+            else:
+                dirs = np.char.add(self.columns["dirs"], "/")
+                mask &= np.char.find(dirs, f"/{constraint.value}/") >= 0
+        return mask
+
+    def stored_vectors(self):
+        """The generation's saved embeddings (embedding_store), row-aligned with the columns"""
+        if self.vectors is None and os.path.exists(f"{self.index_path}{VECTORS_SUFFIX}"):
+            self.vectors = map_npy(f"{self.index_path}{VECTORS_SUFFIX}", "random")
+        return self.vectors
+
+
+class Plan:
+    """Chosen strategy with its estimates; execute() fills in the actual numbers"""
+
+    def __init__(self, strategy, constraints, selectivity, rows, estimated_ms, fetch=None):
+        self.strategy = strategy
+        self.constraints = constraints
+        self.selectivity = selectivity
+        self.estimated_matches = selectivity * rows
+        self.estimated_ms = estimated_ms
+        self.fetch = fetch
+        self.actual_ms = None
+        self.actual_matches = None
+        self.passed = None  # post-filter: candidates that satisfied the constraints
+        self.candidates = None  # post-filter: the unfiltered list fetched, for the semantic cache
+        self.cached = None  # size of the cached candidate list that answered the query
+
+    def report(self):
+        line = f"Plan: {self.strategy}"
+        if self.fetch:
+            line += f" (fetch {self.fetch})"
+        line += (f" for {', '.join(map(repr, self.constraints))} | estimated ~{self.estimated_matches:.0f} "
+                 f"matches, {self.estimated_ms:.1f} ms")
+        if self.fetch:
+            line += f" ({self.selectivity * self.fetch:.0f} of the fetched expected to pass)"
+        if self.cached is not None:
+            line += (f" | answered from {self.cached} cached candidates, {self.passed} passed, "
+                     f"{self.actual_ms:.1f} ms")
+        elif self.actual_ms is not None:
+            if self.passed is not None:
+                line += f" | actual {self.passed} of {self.fetch} passed, {self.actual_ms:.1f} ms"
+            else:
+                line += f" | actual {self.actual_matches} matches, {self.actual_ms:.1f} ms"
+        return line
+
+
+def plan_search(searcher, filters, constraints, top_k):
+    """Cheapest Plan for these constraints; filters is the index's FilterIndex or None"""
+    rows = len(searcher.passage_manager)
+    if filters is None:
+        selectivity = DEFAULT_SELECTIVITY ** len(constraints)
+    else:
+        selectivity = math.prod(filters.selectivity(c) for c in constraints)
+    selectivity = min(max(selectivity, 1.0 / max(rows, 1)), 1.0)
+    matches = selectivity * rows
+
+    fetch = min(math.ceil(top_k / selectivity * OVERFETCH), MAX_FETCH, rows)
+    search_ms = SCAN_MS_PER_ROW * rows if is_exact(searcher) else GRAPH_SEARCH_MS
+    options = [Plan("post-filter", constraints, selectivity, rows, search_ms + fetch * PASSAGE_MS, fetch)]
+    if filters is not None:
+        mask_ms = MASK_MS_PER_ROW * rows
+        if matches <= BRUTE_MAX_ROWS and filters.stored_vectors() is not None:
+            options.append(Plan("brute", constraints, selectivity, rows,
+                                mask_ms + matches * BRUTE_MS_PER_ROW + top_k * PASSAGE_MS))
+        if is_exact(searcher):
+            options.append(Plan("masked", constraints, selectivity, rows,
+                                mask_ms + SCAN_MS_PER_ROW * rows + top_k * PASSAGE_MS))
+    return min(options, key=lambda plan: plan.estimated_ms)
+
+
+def is_exact(searcher):
+    return getattr(searcher, "meta_data", {}).get("backend_name") == "exact"
+
+
+def _score(searcher, vectors, query):
+    """Scores the backend itself would give: cosine for exact indexes and cosine HNSW, else inner product"""
+    metric = searcher.meta_data.get("backend_kwargs", {}).get("distance_metric", "mips")
+    if is_exact(searcher) or metric == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = query / max(np.linalg.norm(query), 1e-12)
+    elif metric == "l2":
+        return -((vectors - query) ** 2).sum(axis=1)
+    return vectors @ query
+
+
+def _passing(candidates, constraints):
+    return [r for r in candidates if all(c.matches(getattr(r, 'metadata', {}) or {}) for c in constraints)]
+
+
+def execute_plan(plan, searcher, filters, query_embedding, top_k, search, deadline=None, candidates=None):
+    """Run a Plan; search(searcher, embedding, top_k) is the unfiltered search
+
+    Returns the results (SearchResult list) and records the actual cost on the plan.
+    deadline: optional query_deadline.Deadline; post-filtering skips its retry and
+    the masked scan stops early once it expires
+    candidates: a ranked unfiltered list from the semantic cache. When top_k of it
+    pass the constraints they are the answer and the plan isn't run.
+    """
+    from leann.api import SearchResult
+
+    start = time.perf_counter()
+    if candidates is not None:
+        results = _passing(candidates, plan.constraints)
+        if len(results) >= top_k:
+            plan.cached = len(candidates)
+            plan.passed = len(results)
+            plan.actual_ms = (time.perf_counter() - start) * 1000
+            return results[:top_k]
+    if plan.strategy == "post-filter":
+        while True:
+            candidates = search(searcher, query_embedding, plan.fetch)
+            results = _passing(candidates, plan.constraints)
+            # Underestimated selectivity: one more try with the largest fetch
+            if len(results) >= top_k or len(candidates) < plan.fetch or plan.fetch >= MAX_FETCH:
+                break
+            if deadline is not None and deadline.expired():
+                deadline.cut_short("post-filter")
+                break
+            plan.fetch = MAX_FETCH
+        plan.candidates = candidates
+        plan.passed = len(results)
+        results = results[:top_k]
+    else:
+        if deadline is not None:
+            deadline.check(plan.strategy)
+        mask = filters.mask(plan.constraints)
+        plan.actual_matches = int(mask.sum())
+        if plan.strategy == "masked":
+            raw = searcher.backend_impl.search(query_embedding, top_k, id_mask=mask, deadline=deadline)
+            hits = list(zip(raw['labels'][0], raw['distances'][0]))
+        else:
+            rows = np.flatnonzero(mask)
+            scores = _score(searcher, np.asarray(filters.stored_vectors()[rows], dtype=np.float32),
+                            np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+            best = np.argsort(-scores, kind="stable")[:top_k]
+            hits = [(str(filters.columns["ids"][rows[i]]), float(scores[i])) for i in best]
+        results = []
+        for passage_id, score in hits:
+            try:
+                passage = searcher.passage_manager.get_passage(passage_id)
+            except KeyError:
+                continue
+            results.append(SearchResult(id=passage_id, score=float(score), text=passage['text'],
+                                        metadata=passage.get('metadata', {})))
+    plan.actual_ms = (time.perf_counter() - start) * 1000
+    return results
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Search daemon serving many indexes from one process
+Each index is a directory under INDEXES_DIR laid out like the directory the
+builder runs in (leann_index/ generations, or a legacy demo.leann), e.g. one
+per user. Searchers are opened on first use (memory-mapped, see
+mapped_index.py) and the least recently used ones are closed when their
+resident size exceeds MEMORY_BUDGET_MB. Query embedding happens in this
+process, so indexes using the same model share one copy of it and one
+embedding cache. A recompute-mode index also needs an embedding server serving
+its own passages, with its own copy of the model. The daemon starts one per
+such index on its first search, counts the server's memory against the budget
+and stops it when the index is evicted.
+
+    python search_daemon.py [indexes dir] [port]
+
+    GET /search?index=<name>&q=<query>[&k=15][&deadline_ms=150]
+    GET /stats                    loaded indexes, sizes, load times, evictions
+    GET /evict?index=<name>       close one index now
+"""
+
+import importlib
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from exact_index import open_searcher
+from index_generations import GenerationWatcher
+from query_cache import SemanticQueryCache
+
+# The search script's file name isn't a valid module name
+search = importlib.import_module("leann-plus-temporal-search")
+
+INDEXES_DIR = Path("./indexes").resolve()
+HOST = "127.0.0.1"
+PORT = 8765
+# Resident size of loaded searchers and their embedding servers (not counting
+# the shared query embedding model)
+MEMORY_BUDGET_MB = 2048
+DEFAULT_TOP_K = 15
+DEFAULT_DEADLINE_MS = search.SEARCH_DEADLINE_MS
+# Recent evictions listed by /stats
+EVICTION_LOG = 50
+
+_INDEX_NAME = re.compile(r"^[\w][\w.-]*$")
+
+
+class UnknownIndex(LookupError):
+    pass
+
+
+def process_rss(pid="self"):
+    """Resident set size of a process (this one by default) in bytes, None where /proc isn't available"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def index_bytes(index_path):
+    """On-disk size of an index's files, the resident size estimate without /proc"""
+    index_path = Path(index_path)
+    return sum(p.stat().st_size for p in index_path.parent.glob(f"{index_path.name}*") if p.is_file())
+
+
+def warm_model(searcher):
+    """Load the index's query encoder now, so the shared model isn't charged to one index"""
+    encoder = None
+    if search.QUERY_ENCODER:
+        encoder = search.encoder_for_index(searcher, search.QUERY_ENCODER, search.QUERY_ENCODER_PATH,
+                                           search.QUERY_ENCODER_THREADS, search.QUERY_ENCODER_ONNX_FILE)
+    search.embed_query(searcher, "warmup", encoder=encoder)
+
+
+class LoadedIndex:
+    """One index's searcher (following its live generation) and per-index caches"""
+
+    def __init__(self, name, directory):
+        self.name = name
+        self.semantic_cache = SemanticQueryCache(
+            threshold=search.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=search.SEMANTIC_CACHE_SIZE,
+            verify_rate=search.SEMANTIC_CACHE_VERIFY_RATE,
+        )
+        self.watcher = GenerationWatcher(
+            directory / search.INDEX_ROOT.name,
+            load=self._load,
+            index_name=search.INDEX_NAME,
+            legacy_path=directory / search.INDEX_NAME,
+            on_switch=self._switched,
+        )
+        self.searcher = None
+        self.load_seconds = 0.0
+        self.resident_bytes = 0
+        self.searches = 0
+        self.last_used = time.time()
+
+    def _load(self, index_path):
+        # The watcher cleans up the previous generation's searcher after this returns
+        if self.searcher is not None:
+            search.FILTER_INDEXES.pop(getattr(self.searcher, 'index_path', None), None)
+        before = process_rss()
+        start = time.perf_counter()
+        # An embedding server of our own, so evicting the index frees it
+        self.searcher = open_searcher(index_path, shared_server=False)
+        self.load_seconds = time.perf_counter() - start
+        after = process_rss()
+        if before is not None and after is not None:
+            self.resident_bytes = max(after - before, 0)
+        else:
+            self.resident_bytes = index_bytes(index_path)
+        warm_model(self.searcher)
+        return self.searcher
+
+    def _switched(self, generation):
+        self.semantic_cache.clear()
+
+    def run(self, function):
+        """function(searcher), charging the process's memory growth to this index"""
+        searcher = self.watcher.get()
+        before = process_rss()
+        result = function(searcher)
+        after = process_rss()
+        if before is not None and after is not None:
+            self.resident_bytes += max(after - before, 0)
+        self.last_used = time.time()
+        return result
+
+    def server_bytes(self):
+        """Resident size of this index's embedding server process, 0 without one"""
+        manager = getattr(getattr(self.searcher, 'backend_impl', None), 'embedding_server_manager', None)
+        process = getattr(manager, 'server_process', None)
+        if process is None or process.poll() is not None:
+            return 0
+        return process_rss(process.pid) or 0
+
+    def total_bytes(self):
+        return self.resident_bytes + self.server_bytes()
+
+    def close(self, searcher=None):
+        searcher = searcher or self.searcher
+        search.FILTER_INDEXES.pop(getattr(searcher, 'index_path', None), None)
+        cleanup = getattr(searcher, 'cleanup', None)
+        if cleanup:
+            cleanup()
+
+    def stats(self):
+        return {
+            'index': self.name,
+            'index_path': getattr(self.searcher, 'index_path', None),
+            'resident_mb': self.resident_bytes / 1024 / 1024,
+            'server_mb': self.server_bytes() / 1024 / 1024,
+            'load_seconds': self.load_seconds,
+            'searches': self.searches,
+            'idle_seconds': time.time() - self.last_used,
+            'semantic_cache': self.semantic_cache.stats(),
+        }
+
+
+class IndexPool:
+    """Loaded indexes, least recently used first, kept under a resident size budget"""
+
+    def __init__(self, indexes_dir=INDEXES_DIR, budget_mb=MEMORY_BUDGET_MB):
+        self.indexes_dir = Path(indexes_dir)
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.loaded = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self.evicted = deque(maxlen=EVICTION_LOG)
+
+    def get(self, name):
+        """LoadedIndex for an index directory name, created on first use"""
+        if not _INDEX_NAME.match(name or "") or not (self.indexes_dir / name).is_dir():
+            raise UnknownIndex(f"unknown index '{name}'")
+        index = self.loaded.get(name)
+        if index is None:
+            index = LoadedIndex(name, self.indexes_dir / name)
+            self.loaded[name] = index
+            self.loads += 1
+        self.loaded.move_to_end(name)
+        return index
+
+    def search(self, name, query, top_k=DEFAULT_TOP_K, deadline_ms=DEFAULT_DEADLINE_MS):
+        index = self.get(name)
+        deadline = search.Deadline(deadline_ms)
+        try:
+            found = index.run(lambda searcher: search.find_files(query, top_k, searcher, deadline,
+                                                                 index.semantic_cache))
+        except FileNotFoundError:
+            # Nothing published (or built) in that directory yet
+            if index.searcher is None:
+                self.loaded.pop(name, None)
+            raise
+        index.searches += 1
+        self.enforce_budget(keep=name)
+        return found
+
+    def resident_bytes(self):
+        return sum(index.total_bytes() for index in self.loaded.values())
+
+    def enforce_budget(self, keep=None):
+        """Evict least recently used indexes (never keep) until under the budget"""
+        while self.resident_bytes() > self.budget_bytes:
+            name = next((n for n in self.loaded if n != keep), None)
+            if name is None:
+                break
+            self.evict(name, "budget")
+
+    def evict(self, name, reason="request"):
+        index = self.loaded.pop(name, None)
+        if index is None:
+            return False
+        resident_bytes = index.total_bytes()
+        if index.searcher is not None:
+            index.close()
+        self.evictions += 1
+        self.evicted.append({
+            'index': name,
+            'reason': reason,
+            'resident_mb': resident_bytes / 1024 / 1024,
+            'idle_seconds': time.time() - index.last_used,
+            'at': time.time(),
+        })
+        return True
+
+    def stats(self):
+        return {
+            'budget_mb': self.budget_bytes / 1024 / 1024,
+            'resident_mb': self.resident_bytes() / 1024 / 1024,
+            'process_rss_mb': (process_rss() or 0) / 1024 / 1024,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'recent_evictions': list(self.evicted),
+            'loaded': [index.stats() for index in reversed(self.loaded.values())],
+            'embedding_cache': search.EMBEDDING_CACHE.stats(),
+            'deadlines': search.DEADLINE_STATS.stats(),
+        }
+
+
+def result_json(result):
+    return {'id': result.id, 'score': float(result.score), 'text': result.text,
+            'metadata': getattr(result, 'metadata', None) or {}}
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    pool = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == "/search":
+                deadline_ms = params.get('deadline_ms')
+                found = self.pool.search(params.get('index'), params.get('q', ""),
+                                         int(params.get('k', DEFAULT_TOP_K)),
+                                         float(deadline_ms) if deadline_ms else DEFAULT_DEADLINE_MS)
+                if found is None:
+                    return self.send_json(400, {'error': "add more input for accurate results"})
+                results, _, plan = found
+                self.send_json(200, {
+                    'results': [result_json(r) for r in results],
+                    'partial': results.partial,
+                    'stage': results.stage,
+                    'elapsed_ms': results.elapsed_ms,
+                    'plan': plan.report() if plan else None,
+                })
+            elif url.path == "/stats":
+                self.send_json(200, self.pool.stats())
+            elif url.path == "/evict":
+                self.send_json(200, {'evicted': self.pool.evict(params.get('index'))})
+            else:
+                self.send_json(404, {'error': f"unknown path {url.path}"})
+        except (UnknownIndex, FileNotFoundError) as e:
+            self.send_json(404, {'error': str(e)})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': f"{e.__class__.__name__}: {e}"})
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(indexes_dir=INDEXES_DIR, port=PORT):
+    DaemonHandler.pool = IndexPool(indexes_dir)
+    # One request at a time: memory growth is charged to the index that caused it
+    server = HTTPServer((HOST, port), DaemonHandler)
+    print(f"Serving indexes under {indexes_dir} on http://{HOST}:{port} "
+          f"(budget {MEMORY_BUDGET_MB} MB)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for name in list(DaemonHandler.pool.loaded):
+            DaemonHandler.pool.evict(name, "shutdown")
+
+
+if __name__ == "__main__":
+    indexes_dir = Path(sys.argv[1]).resolve() if len(sys.argv) > 1 else INDEXES_DIR
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else PORT
+    serve(indexes_dir, port)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Choose between LEANN's stored-embedding and recompute modes for a build
+Stored mode keeps every vector in the index: largest, fastest to search.
+Recompute mode keeps only a pruned graph and re-embeds the passages a query
+visits: ~97% smaller, but each query pays for re-embedding them. Recompute
+builds also skip the embedding store's copy of the vectors (embedding_store.py),
+so their rebuilds re-embed every file. Both are estimated from the corpus size
+and the measured speed of the embedding model, then the fastest mode that fits
+the size budget is picked.
+The choice is recorded in the index meta (is_pruned), which is what searchers
+read, so a search can't use the wrong recompute_embeddings flag.
+"""
+
+import json
+import time
+
+# HNSW graph degree (LEANN's default M); level 0 keeps 2 * M neighbours per node
+HNSW_M = 32
+# Pruned graphs keep roughly this many neighbours per node
+RECOMPUTE_DEGREE = 18
+# Rough number of passages a recompute query re-embeds at complexity 64
+RECOMPUTE_PASSAGES_PER_QUERY = 400
+# Graph search over stored vectors, excluding the query embedding
+STORED_SEARCH_MS = 5.0
+
+# Typical widths of the planner's extension and passage id columns
+COLUMN_EXT_CHARS = 5
+COLUMN_ID_CHARS = 7
+
+# Texts embedded when calibrate() has to measure the model itself
+CALIBRATION_SAMPLE = 64
+
+
+def calibrate(texts, model, mode, options=None, sample=CALIBRATION_SAMPLE):
+    """(seconds per passage in a batch, seconds per single query) for this embedding model"""
+    from leann.api import compute_embeddings
+
+    texts = list(texts[:sample]) or ["calibration"]
+    # First call loads the model; not part of either measurement
+    compute_embeddings(texts[:1], model, mode, use_server=False, provider_options=options)
+
+    start = time.perf_counter()
+    compute_embeddings(texts, model, mode, use_server=False, provider_options=options)
+    per_passage = (time.perf_counter() - start) / len(texts)
+
+    start = time.perf_counter()
+    compute_embeddings(texts[:1], model, mode, use_server=False, provider_options=options)
+    per_query = time.perf_counter() - start
+    return per_passage, per_query
+
+
+def passage_bytes(chunks, sample=1000):
+    """Average size of one passage line in .passages.jsonl, from the first chunks"""
+    chunks = chunks[:sample]
+    if not chunks:
+        return 0
+    total = sum(len(json.dumps({"id": str(i), "text": c["text"], "metadata": c.get("metadata", {})},
+                               ensure_ascii=False).encode("utf-8")) + 1
+                for i, c in enumerate(chunks))
+    return total / len(chunks)
+
+
+def sidecar_bytes(chunks, sample=1000):
+    """Average per-passage size of the files either mode writes next to the index
+
+    The embedding store's items (id, path, text) and the query planner's filter
+    columns, which numpy stores fixed-width at 4 bytes per character of the
+    longest value. Estimated from the first chunks.
+    """
+    chunks = chunks[:sample]
+    if not chunks:
+        return 0
+    texts = [c["text"] for c in chunks]
+    paths = [str(c.get("metadata", {}).get("path", "")) for c in chunks]
+    items = sum(len(json.dumps([str(i), p, t], ensure_ascii=False).encode("utf-8"))
+                for i, (p, t) in enumerate(zip(paths, texts))) / len(chunks)
+    dates = [str(c.get("metadata", {}).get("modification_date", "")) for c in chunks]
+    dirs = [p.rsplit("/", 1)[0] for p in paths]
+    columns = 4 * (max(map(len, dates)) + max(map(len, dirs)) + COLUMN_ID_CHARS + COLUMN_EXT_CHARS)
+    return items + columns
+
+
+def estimate_modes(count, dimensions, bytes_per_passage, seconds_per_passage, query_seconds,
+                   bytes_per_sidecar=0):
+    """{"stored": {...}, "recompute": {...}} with index bytes and query latency estimates
+
+    bytes_per_sidecar: per-passage size of the store items and filter columns
+    (sidecar_bytes). Stored mode also keeps the store's float32 vectors for
+    embedding reuse; recompute builds don't write them.
+    """
+    passages = count * (bytes_per_passage + bytes_per_sidecar)
+    revisited = min(RECOMPUTE_PASSAGES_PER_QUERY, count)
+    return {
+        "stored": {
+            "bytes": int(2 * count * dimensions * 4 + count * 2 * HNSW_M * 4 + passages),
+            "latency_ms": query_seconds * 1000 + STORED_SEARCH_MS,
+        },
+        "recompute": {
+            "bytes": int(count * RECOMPUTE_DEGREE * 4 + passages),
+            "latency_ms": (query_seconds + revisited * seconds_per_passage) * 1000 + STORED_SEARCH_MS,
+        },
+    }
+
+
+def choose_mode(estimates, budget_bytes=None, latency_target_ms=None):
+    """("stored" | "recompute", reason) for the estimates of estimate_modes()"""
+    stored, recompute = estimates["stored"], estimates["recompute"]
+    if budget_bytes is None or stored["bytes"] <= budget_bytes:
+        return "stored", "stored vectors fit the budget"
+    if latency_target_ms is not None and recompute["latency_ms"] > latency_target_ms:
+        return "recompute", (f"stored vectors exceed the budget; recompute misses the "
+                             f"{latency_target_ms:.0f} ms latency target")
+    if recompute["bytes"] > budget_bytes:
+        return "recompute", "neither mode fits the budget; recompute is the smallest"
+    return "recompute", "stored vectors exceed the budget, recompute fits"
+
+
+def apply_mode(builder, mode):
+    """Configure a LEANN HNSW builder for the chosen mode (recompute needs the compact graph)"""
+    recompute = mode == "recompute"
+    builder.backend_kwargs["is_recompute"] = recompute
+    builder.backend_kwargs["is_compact"] = recompute
+
+
+def needs_recompute(meta):
+    """Whether an index (by its meta data) was built without stored embeddings"""
+    backend_kwargs = meta.get("backend_kwargs", {})
+    return bool(meta.get("is_pruned", backend_kwargs.get("is_recompute", False)))
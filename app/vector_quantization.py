@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Quantized vector storage for the exact index
+int8: per-dimension symmetric scalar quantization, 4x smaller than float32.
+pq: product quantization, each group of PQ_SUBVECTOR_DIMS dimensions stored
+as one byte (index into 256 trained centroids), 4 * PQ_SUBVECTOR_DIMS x smaller.
+Both are scored with asymmetric distance computation (ADC): the query stays
+full precision and only the stored side is approximated.
+pca: projection onto the top principal components, for a cheap low-dimensional
+first pass whose candidates are rescored at full dimension.
+"""
+
+import numpy as np
+
+PQ_SUBVECTOR_DIMS = 4
+PQ_CENTROIDS = 256
+PQ_TRAIN_SAMPLE = 20000
+PQ_ITERATIONS = 12
+PCA_TRAIN_SAMPLE = 50000
+ENCODE_BLOCK = 65536
+
+
+def train_int8(vectors):
+    """Per-dimension scale mapping [-max|x|, max|x|] onto [-127, 127]"""
+    scale = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0) / 127.0
+    return np.maximum(scale, 1e-12).astype(np.float32)
+
+
+def encode_int8(vectors, scale):
+    codes = np.rint(np.asarray(vectors, dtype=np.float32) / scale)
+    return np.clip(codes, -127, 127).astype(np.int8)
+
+
+def int8_scorer(codes, scale):
+    """score_block(start, end, queries) -> (Q, B) ADC inner products against int8 codes"""
+    def score_block(start, end, queries):
+        return (queries * scale) @ np.asarray(codes[start:end], dtype=np.float32).T
+    return score_block
+
+
+def _kmeans(points, k, iterations, rng):
+    """Plain Lloyd's k-means; returns (k, d) centroids"""
+    if len(points) <= k:
+        # Too few points to train on: use them all, pad with copies
+        return points[rng.integers(0, len(points), k)] if len(points) else np.zeros((k, points.shape[1]), np.float32)
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(points, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, points)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+    return centroids
+
+
+def _nearest(points, centroids):
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * points @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def train_pq(vectors, subvector_dims=PQ_SUBVECTOR_DIMS, seed=0):
+    """(M, 256, subvector_dims) codebooks trained on a sample of vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n, dims = vectors.shape
+    if dims % subvector_dims:
+        raise ValueError(f"{dims} dimensions are not divisible into subvectors of {subvector_dims}")
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(n, min(n, PQ_TRAIN_SAMPLE), replace=False)]
+    subspaces = dims // subvector_dims
+    codebooks = np.empty((subspaces, PQ_CENTROIDS, subvector_dims), dtype=np.float32)
+    for m in range(subspaces):
+        part = sample[:, m * subvector_dims:(m + 1) * subvector_dims]
+        codebooks[m] = _kmeans(part, PQ_CENTROIDS, PQ_ITERATIONS, rng)
+    return codebooks
+
+
+def encode_pq(vectors, codebooks):
+    """(N, M) uint8 codes: nearest centroid per subvector"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    subspaces, _, subvector_dims = codebooks.shape
+    codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+    for start in range(0, len(vectors), ENCODE_BLOCK):
+        block = np.asarray(vectors[start:start + ENCODE_BLOCK], dtype=np.float32)
+        for m in range(subspaces):
+            part = block[:, m * subvector_dims:(m + 1) * subvector_dims]
+            codes[start:start + len(block), m] = _nearest(part, codebooks[m])
+    return codes
+
+
+def pq_scorer(codes, codebooks):
+    """score_block(start, end, queries) -> (Q, B) ADC inner products against PQ codes"""
+    subspaces, _, subvector_dims = codebooks.shape
+    offsets = (np.arange(subspaces) * codebooks.shape[1])[None, :]
+
+    def score_block(start, end, queries):
+        block = np.asarray(codes[start:end], dtype=np.intp) + offsets  # (B, M) into flat tables
+        scores = np.empty((len(queries), len(block)), dtype=np.float32)
+        for qi, query in enumerate(queries):
+            # Lookup table: inner product of each query subvector with every centroid
+            table = np.einsum("mkd,md->mk", codebooks, query.reshape(subspaces, subvector_dims)).ravel()
+            scores[qi] = table[block].sum(axis=1)
+        return scores
+    return score_block
+
+
+def train_pca(vectors, dims, seed=0):
+    """(mean (D,), components (D, dims)) of a sample of vectors, largest variance first"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not 0 < dims <= vectors.shape[1]:
+        raise ValueError(f"can't project {vectors.shape[1]} dimensions to {dims}")
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), PCA_TRAIN_SAMPLE), replace=False)]
+    mean = sample.mean(axis=0)
+    centered = sample - mean
+    # eigh returns ascending eigenvalues; keep the last dims, largest first
+    _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    return mean.astype(np.float32), np.ascontiguousarray(eigenvectors[:, ::-1][:, :dims], dtype=np.float32)
+
+
+def project_pca(vectors, mean, components):
+    """(N, dims) projections of stored vectors, blockwise"""
+    out = np.empty((len(vectors), components.shape[1]), dtype=np.float32)
+    for start in range(0, len(vectors), ENCODE_BLOCK):
+        block = np.asarray(vectors[start:start + ENCODE_BLOCK], dtype=np.float32)
+        out[start:start + len(block)] = (block - mean) @ components
+    return out
@@ -4,10 +4,24 @@ import chromadb
 import re
 from datetime import datetime, timedelta
 
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from index_generations import GenerationWatcher
 
+
+# chroma_index_builder.py publishes each build as a generation under CHROMA_ROOT;
+# CHROMA_PATH is the pre-generation layout, still used when nothing was published
+CHROMA_ROOT = Path("./").resolve() / "chroma_index"
 CHROMA_PATH = str(Path("./").resolve() / "monke_index")
 COLLECTION_NAME = "files"
 
+# Collection for this process, reopened automatically after a rebuild
+CURRENT_COLLECTION = GenerationWatcher(
+    CHROMA_ROOT,
+    load=lambda path: chromadb.PersistentClient(path=path).get_collection(name=COLLECTION_NAME),
+    legacy_path=CHROMA_PATH,
+)
+
 
 class TimeParser:
     def __init__(self):
@@ -46,8 +60,7 @@ class TimeParser:
 
 
 def search_files(query, top_k=15):
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_collection(name=COLLECTION_NAME)
+    collection = CURRENT_COLLECTION.get()
 
     parser = TimeParser()
     time_matches = parser.parse(query)
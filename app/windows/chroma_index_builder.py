@@ -3,22 +3,60 @@ import sys
 from pathlib import Path
 import chromadb
 
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from index_generations import new_generation, publish_generation, discard_generation, collect_garbage
+from embedding_templates import get_template
 
-CHROMA_PATH = str(Path("./").resolve() / "monke_index")
+
+# Every build goes into a new generation under CHROMA_ROOT; searchers follow CHROMA_ROOT/CURRENT
+CHROMA_ROOT = Path("./").resolve() / "chroma_index"
 COLLECTION_NAME = "files"
+KEEP_GENERATIONS = 2  # live generation + the previous one for searchers still holding it
+
+# Text each file is embedded as, see embedding_templates.py
+EMBEDDING_TEMPLATE = "chroma"
+
+def validate_collection(collection, expected_items, sample_text):
+    """Make sure a freshly built collection is complete and searchable"""
+    count = collection.count()
+    if count != expected_items:
+        raise RuntimeError(f"collection has {count} items, expected {expected_items}")
+    if not collection.query(query_texts=[sample_text], n_results=1)['ids'][0]:
+        raise RuntimeError("sample query returned no results")
 
 def process_json_items(json_file_path):
     """Load JSON file and add items to a persistent ChromaDB collection."""
     with open(json_file_path, 'r', encoding='utf-8') as f:
         items = json.load(f)
 
-    # change-path to build persistent monkey index 
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    # build into a fresh generation, the live one keeps serving until we publish
+    generation = new_generation(CHROMA_ROOT)
+    CHROMA_PATH = str(generation)
+    try:
+        collection = build_collection(items, CHROMA_PATH)
+    except BaseException:
+        discard_generation(generation)
+        raise
+
+    publish_generation(CHROMA_ROOT, generation)
+    print(f"\n\n✓ Index built and saved to {CHROMA_PATH} (now live)")
+    print(f"Total items in collection: {collection.count()}")
+
+    for old in collect_garbage(CHROMA_ROOT, keep=KEEP_GENERATIONS):
+        print(f"  removed old generation {old.name}")
+
+def build_collection(items, chroma_path):
+    """Embed items into a new collection at chroma_path and validate it"""
+    if not items:
+        raise ValueError("No items to index")
+    client = chromadb.PersistentClient(path=chroma_path)
 
     collection = client.get_or_create_collection(name=COLLECTION_NAME)
 
     total_items = len(items)
-    print(f"Processing {total_items} items...")
+    template = get_template(EMBEDDING_TEMPLATE)
+    print(f"Processing {total_items} items (embedding template {template.key})...")
 
     batch_size = 100
     for i in range(0, total_items, batch_size):
@@ -29,7 +67,7 @@ def process_json_items(json_file_path):
         ids = []
 
         for idx, item in enumerate(batch_items):
-            embedding_text = f"{item.get('Name', 'unknown')} located at {item.get('Path', 'unknown')} of type {item.get('Kind', 'unknown')}"
+            embedding_text = template.render(item)
             
             metadata = {
                 'path': item.get('Path', ''), 
@@ -54,9 +92,9 @@ def process_json_items(json_file_path):
         sys.stdout.write(f"\rProgress: {i + len(batch_items)}/{total_items} ({progress:.1f}%)")
         sys.stdout.flush()
 
-    print(f"\n\n✓ Index built and saved to {CHROMA_PATH}")
-    print(f"Total items in collection: {collection.count()}")
-    
+    print("\nValidating collection...")
+    validate_collection(collection, total_items, documents[0])
+    return collection
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
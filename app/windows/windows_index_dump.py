@@ -1,8 +1,13 @@
 import os
 import json
 import sys
-from datetime import datetime
-import mimetypes 
+from pathlib import Path
+
+# Shared helpers live one level up in app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawler import IgnoreRules, CrawlStats, NewestFiles, walk_files
+from file_records import file_type, iso_timestamp
+from archive_members import ARCHIVE_SEPARATOR, is_archive, list_members
 
 
 # define the folders to index
@@ -14,55 +19,110 @@ SEARCH_FOLDERS = [
     os.path.join(HOME_DIR, "Pictures"),
 ]
 
+# gitignore-style patterns skipped during the crawl; matching folders are never walked.
+# Patterns containing a "/" are relative to each search folder.
+IGNORE_PATTERNS = [
+    ".git/",
+    "node_modules/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    ".cache/",
+    "*.pyc",
+    "desktop.ini",
+    "Thumbs.db",
+]
+
+# Per-folder ignore files, applied to the folder they live in (like .gitignore)
+IGNORE_FILE_NAMES = [".monkeignore", ".gitignore"]
+
+# Visit the most recently modified folders first and keep the max_items newest
+# files (whole tree is crawled) instead of the first max_items found
+CRAWL_NEWEST_FIRST = False
+
+# Also index the files inside zip/tar archives as "archive.zip!/inner/path" (nothing is extracted)
+INDEX_ARCHIVES = False
+
 
 # os.walk is literally slow of large index 
 # we're supposed to use win32 api using 'pywin32' / 'pypiwin32' for sub-second indexing, but couldn't get the stable build 
 def dump_file_metadata(max_items=1000, output_file="os_walk_dump.json"):
     results = []
-    print("Starting file scan with os.walk. This may take a while...")
+    stats = CrawlStats()
+    print("Starting file scan. This may take a while...")
 
+    folders = []
     for folder in SEARCH_FOLDERS:
         if not os.path.exists(folder):
             print(f"Warning: Folder not found, skipping: {folder}")
             continue
-
         print(f"Scanning: {folder}")
-        for root, _, files in os.walk(folder):
-            for filename in files:
-                if len(results) >= max_items:
-                    break 
-
-                file_path = os.path.join(root, filename)
-                try:
-                    stats = os.stat(file_path)
-
-                    content_type, _ = mimetypes.guess_type(file_path)
-                    
-                    item = {
-                        'Path': file_path,
-                        'Name': filename,
-                        'Size': stats.st_size,
-                        'ContentType': content_type if content_type else 'unknown',
-                        'Kind': os.path.splitext(filename)[1],
-                        'CreationDate': datetime.fromtimestamp(stats.st_birthtime).isoformat(),
-                        'ContentChangeDate': datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                    }
-                    results.append(item)
-                    
-                    if len(results) % 100 == 0:
-                        sys.stdout.write(f"\rFound {len(results)} files...")
-                        sys.stdout.flush()
-
-                except (FileNotFoundError, PermissionError) as e:
-                    continue
+        folders.append(folder)
+    rules = IgnoreRules(IGNORE_PATTERNS, ignore_file_names=IGNORE_FILE_NAMES, roots=folders)
+
+    newest = NewestFiles(max_items) if CRAWL_NEWEST_FIRST else None
+    found = 0
+    for file_path in walk_files(folders, rules, stats, newest_first=CRAWL_NEWEST_FIRST):
+        if newest is None and len(results) >= max_items:
+            break 
+
+        filename = os.path.basename(file_path)
+        try:
+            file_stats = os.stat(file_path)
+            if newest is not None and newest.oldest_mtime is not None and file_stats.st_mtime <= newest.oldest_mtime:
+                continue
+
+            # Resolved once per extension instead of mimetypes.guess_type per file
+            ext, content_type, _ = file_type(filename)
+            
+            item = {
+                'Path': file_path,
+                'Name': filename,
+                'Size': file_stats.st_size,
+                'ContentType': content_type,
+                'Kind': ext,
+                'CreationDate': iso_timestamp(file_stats.st_birthtime),
+                'ContentChangeDate': iso_timestamp(file_stats.st_mtime),
+            }
+            entries = [(item, file_stats.st_mtime)]
+            if INDEX_ARCHIVES and is_archive(filename):
+                for member_path, member_size, member_mtime in list_members(file_path, file_stats.st_size):
+                    member_name = member_path.rpartition("/")[2]
+                    member_ext, member_type, _ = file_type(member_name)
+                    stamp = iso_timestamp(member_mtime)
+                    entries.append(({
+                        'Path': f"{file_path}{ARCHIVE_SEPARATOR}{member_path}",
+                        'Name': member_name,
+                        'Size': member_size,
+                        'ContentType': member_type,
+                        'Kind': member_ext,
+                        'CreationDate': stamp,
+                        'ContentChangeDate': stamp,
+                        'Archive': file_path,
+                    }, member_mtime))
+
+            for entry, mtime in entries:
+                if newest is not None:
+                    newest.offer(mtime, entry)
+                else:
+                    results.append(entry)
+                found += 1
             
-            if len(results) >= max_items:
-                break
-        
-        if len(results) >= max_items:
-            break
+            if found % 100 == 0:
+                sys.stdout.write(f"\rFound {found} files...")
+                sys.stdout.flush()
+
+        except (FileNotFoundError, PermissionError) as e:
+            continue
+
+    if newest is not None:
+        results = newest.newest_first()
+    else:
+        results = results[:max_items]  # archive members can overshoot the cap
 
-    print(f"\nScan complete. Saving {len(results)} items to {output_file}")
+    print()
+    stats.report()
+    print(f"Scan complete. Saving {len(results)} items to {output_file}")
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(results, f, indent=2, ensure_ascii=False)